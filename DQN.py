@@ -232,8 +232,6 @@ if __name__ == "__main__":
 
 	height = args.height
 	episode_returns = []
-	numRecentCorrectChoice = []
-	totalReturns = [] # Return per episode
 	choice_made = []
 	correct_choice = []
 	finalDecisionTime = []
@@ -241,9 +239,7 @@ if __name__ == "__main__":
 	traj_group = []
 	total_loss = []
 	env_name = 'tokens-v0'
-	numCorrectChoice = 0
-	last_choice = 0
-	decisionTime = np.zeros(shape=((height*2)+1)) # histogram of decision times per episode
+	stats = utils.EpisodeStats(height) # returns, correct choices and decision times of the episodes
 
 	# set up matplotlib
 	# is_ipython = 'inline' in matplotlib.get_backend()
@@ -429,21 +425,10 @@ if __name__ == "__main__":
 				txt_logger.info(f"{traj}")
 				txt_logger.info("get traj return")
 
-				totalReturns.append(reward) # reward per episode
 				traj_group.append(traj)
 
-				if reward > 0:
-					numCorrectChoice += 1
-					numRecentCorrectChoice.append(1)
-				else:
-					numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
-
-				decision_step = _augState(abs(nstate[1])) # taking abs means that decision step is always between 15 and 31
-				decisionTime[decision_step-1] += 1 # after each episode is done, one is added to the corresponding element in decision time,
-				# so after 100 episodes, we have a histogram of decision times
-
-				if abs(nstate[1]) == 0: # if we made no decision till the end
-					last_choice += 1 # last choice represents the number of episodes in which we waited until the end
+				# taking abs means that decision step is always between 15 and 31, waiting means no decision till the end
+				stats.add_game(reward, abs(nstate[1]), waited=abs(nstate[1]) == 0)
 				
 				txt_logger.info("append begin")
 				choice_made.append(_sign(nstate[1])) # these arays are updated after each episode, not after each timestep
@@ -467,11 +452,7 @@ if __name__ == "__main__":
 		# if num_episodes % 10 == 0: # if the game has not stpped and we moved an episode forward
 
 		# duration = int(time.time() - start_time)
-		totalReturn_val = np.sum(totalReturns) # sum of all episodic returns
-		txt_logger.info(f"totalReturn done {totalReturn_val}")
-
-		avg_returns = np.mean(totalReturns[-1000:])
-		recent_correct = np.mean(numRecentCorrectChoice[-1000:])
+		txt_logger.info(f"totalReturn done {stats.total_return}")
 		txt_logger.info("avg , recent done")
 
 		header = ["Game"]
@@ -479,7 +460,7 @@ if __name__ == "__main__":
 		txt_logger.info("game header done")
 
 		header += ["Returns", "Avg Returns", "Correct Percentage", "Recent Correct", "decision_time"]
-		data += [totalReturn_val.item(), avg_returns.item(), numCorrectChoice/(i_episode+1), recent_correct, finalDecisionTime[i_episode]]
+		data += [stats.total_return, stats.avg_return(), stats.correct_percentage(), stats.recent_correct(), finalDecisionTime[i_episode]]
 		txt_logger.info("other headers done")
 
 		txt_logger.info(
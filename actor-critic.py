@@ -14,8 +14,6 @@ import sys
 import utils
 import lib
 
-import numpy as np
-
 
 class Actor(nn.Module):
 	def __init__(self, in_dim, h_dim, out_dim_p):
@@ -90,6 +88,7 @@ def a2c():
 	parser.add_argument('--fancy_discount', help='use fancy discounting rewards',action='store_true')
 	parser.add_argument('--fast_block', help='fast block discounting',action='store_true')
 	parser.add_argument('--variation', default="horizon", help='which variation')
+	parser.add_argument('--csv_log', help='also export the per-game log to log.csv at the end of the run',action='store_true')
 
 	args = parser.parse_args()
 
@@ -103,7 +102,7 @@ def a2c():
 	# Load loggers and Tensorboard writer
 
 	txt_logger = utils.get_txt_logger(model_dir)
-	csv_file, csv_logger = utils.get_csv_logger(model_dir)
+	episode_log = utils.get_episode_log(model_dir, args.height) # binary log of the logged games, see utils.load_episode_log
 
 	# Log command and all script arguments
 
@@ -132,25 +131,18 @@ def a2c():
 
 	start_time = time.time()
 
-	episodes_decison_times = []
-	episodes_loss = []
-
-	episodes_decison_times = np.zeros(shape=((args.height*2)+1)) # histogram of decision times per episode
-	#NOTE why first 15 elements are always empty
+	stats = utils.EpisodeStats(args.height) # returns, correct choices and decision times of the episodes
 
 	episode_choice = [] # choise of each episode
 	correct_choice = []
 	final_episode_decison_time = []
 	episode_returns = []
-	numCorrectChoice = 0
-	numRecentCorrectChoice = []
 
 	lr = args.lr
 	h_dim_p = 256
 	h_dim_v = 64
 	input_shape = env.observation_space.shape[0]
 
-	last = 0
 	# create the actor network and it's optimizer
 	actor = Actor(env.observation_space.shape[0], h_dim_p ,env.action_space.n)
 	optimizer_actor = optim.Adam(actor.parameters(), lr=0.001)
@@ -207,66 +199,38 @@ def a2c():
 
 		num_episode+=1
 		run_trajectories.append(env.get_trajectory())
-		decision_step = _augState(abs(s[1]), args.height) # taking abs means that decision step is always between 15 and 31
-		episodes_decison_times[decision_step-1] += 1 # after each episode is done, one is added to the corresponding element in decision time,
-		#FIXME check the index
-		# so after 100 episodes, we have a histogram of decision times
-
-		if abs(s[1]) == args.height+1: # if we made no decision till the end
-			last += 1 # last choice represents the number of episodes in which we waited until the end
-
 		episode_choice.append(_sign(s[1])) # these arays are updated after each episode, not after each timestep
 		correct_choice.append(_sign(env.trajectory[-1]))
 		final_episode_decison_time.append(abs(s[1])) # Why next_state? because it is the latest state that we have and we don't update state until after the if-else condition
 
-		if args.env == 'tokens-v3' or args.env == 'tokens-v4':
-			episode_returns.append(env.reward) # reward per episode
-			if env.reward > 0:
-				numCorrectChoice += 1
-				numRecentCorrectChoice.append(1)
-			else:
-				numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
-
-		else:
-			episode_returns.append(reward) # reward per episode
-			if reward > 0:
-				numCorrectChoice += 1
-				numRecentCorrectChoice.append(1)
-			else:
-				numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
+		episode_returns.append(env.reward if args.env == 'tokens-v3' or args.env == 'tokens-v4' else reward) # reward per episode
+		# taking abs means that decision step is always between 15 and 31, waiting means no decision till the end
+		stats.add_game(episode_returns[-1], abs(s[1]), waited=abs(s[1]) == args.height+1)
 
 		if num_episode > prev_num_episode and num_episode % args.log_interval == 0: # if the game has not stpped and we moved an episode forward
 
 			duration = int(time.time() - start_time)
-			episode_total_loss = np.sum(episodes_loss) # sum of all episodic losses
-			totalReturn_val = np.sum(episode_returns) # sum of all episodic returns
-
-			avg_loss = np.mean(episodes_loss[-1000:])
-			avg_returns = np.mean(episode_returns[-1000:])
-			recent_correct = np.mean(numRecentCorrectChoice[-1000:])
 
 			header = ["Games", "duration"]
 			data = [num_episode, duration] # update and num_frames are +=15 ed
 
 			header += ["lr", "last"]
-			data += [lr, last]
+			data += [lr, stats.num_waited]
 
 			header += ["Returns", "Avg Returns", "Correct Percentage", "Recent Correct", "decision_time"]
-			data += [totalReturn_val.item(), avg_returns.item(), numCorrectChoice/num_episode, recent_correct, final_episode_decison_time[prev_num_episode]]
+			data += [stats.total_return, stats.avg_return(), stats.correct_percentage(), stats.recent_correct(), final_episode_decison_time[prev_num_episode]]
 
 			txt_logger.info(
 				"G {} | D {} | LR {:.5f} | Last {} | R {:.3f} | Avg R {:.3f} | Avg C {:.3f} | Rec C {:.3f} | DT {}"
 				.format(*data))
 
-			csv_header = ["trajectory", "choice_made", "correct_choice", "decision_time", "reward_received"]
-			csv_data = [run_trajectories[prev_num_episode], episode_choice[prev_num_episode], correct_choice[prev_num_episode], final_episode_decison_time[prev_num_episode], episode_returns[prev_num_episode]]
+			episode_log.add_game(run_trajectories[prev_num_episode], episode_choice[prev_num_episode], correct_choice[prev_num_episode], final_episode_decison_time[prev_num_episode], episode_returns[prev_num_episode])
 
-			if num_episode == 1:
-				csv_logger.writerow(csv_header)
-			csv_logger.writerow(csv_data)
-			csv_file.flush()
-			
 			prev_num_episode = num_episode
 
+	episode_log.close()
+	if args.csv_log:
+		utils.export_csv(model_dir)
+
 if __name__ == "__main__":
 	a2c()
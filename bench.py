@@ -0,0 +1,94 @@
+import argparse
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from gym_tokens.envs import TokensEnv, TokensEnv2, TokensVecEnv
+
+def make_actions(num_steps, height, seed):
+	'''
+	Random actions that commit about once per game so episodes run their usual length.
+	: return (np.ndarray) : actions in [-1,0,1]
+	'''
+	commit = 1.0 / (height + 1)
+	rng = np.random.default_rng(seed)
+	return rng.choice([-1, 0, 1], size=num_steps, p=[commit/2, 1 - commit, commit/2]).tolist()
+
+def bench_env(env_cls, obs_type, args):
+	'''
+	Plays args.steps steps of a scalar env the way main.py does, resetting finished games.
+	: return (float) : steps per second
+	'''
+	env = env_cls(0.75, seed=args.seed, terminal=args.height, v=args.variation, obs_type=obs_type)
+	actions = make_actions(args.steps, args.height, args.seed)
+	env.reset()
+	start = time.perf_counter()
+	for action in actions:
+		next_state, reward, is_done, game_time_step = env.step(action)
+		if is_done:
+			env.reset()
+	return args.steps / (time.perf_counter() - start)
+
+def bench_vec_env(args):
+	'''
+	Plays args.steps game-steps with TokensVecEnv.
+	: return (float) : game-steps per second
+	'''
+	env = TokensVecEnv(args.num_envs, 0.75, seed=args.seed, terminal=args.height, v=args.variation)
+	num_batches = max(args.steps // args.num_envs, 1)
+	actions = np.array(make_actions(num_batches * args.num_envs, args.height, args.seed)).reshape(num_batches, args.num_envs)
+	start = time.perf_counter()
+	for batch in actions:
+		env.step(batch)
+	return num_batches * args.num_envs / (time.perf_counter() - start)
+
+# modules a tabular run must not load at import time
+HEAVY_MODULES = ['torch', 'scipy', 'pandas']
+
+IMPORT_CHECK = '''
+import sys, time
+start = time.perf_counter()
+import gym_tokens, lib, utils
+print(time.perf_counter() - start)
+print(" ".join(name for name in {} if name in sys.modules))
+'''.format(HEAVY_MODULES)
+
+def bench_imports():
+	'''
+	Imports the packages of a tabular run in a fresh interpreter.
+	: return (tuple) : import time in seconds and the heavy modules that got loaded
+	'''
+	output = subprocess.run([sys.executable, '-c', IMPORT_CHECK], capture_output=True, text=True, check=True).stdout.split('\n')
+	return float(output[0]), output[1].split()
+
+def main():
+
+	parser = argparse.ArgumentParser(description="microbenchmark of the tokens env step paths")
+	parser.add_argument("--steps", type=int, default=200000, help="number of env steps per measurement")
+	parser.add_argument("--height", type=int, default=15, help="game tree height")
+	parser.add_argument("--variation", default="terminate", help="which variation")
+	parser.add_argument("--num_envs", type=int, default=4096, help="number of games of the vectorized env")
+	parser.add_argument("--seed", type=int, default=7, help="random seed (default: 7)")
+	parser.add_argument("--import_budget", type=float, default=1.0, help="seconds allowed to import gym_tokens, lib and utils")
+
+	args = parser.parse_args()
+
+	import_time, heavy = bench_imports()
+	print("{:<12} {:<7} {:>12.3f} s  budget {:.3f} s".format('imports', '', import_time, args.import_budget))
+	if heavy or import_time > args.import_budget:
+		sys.exit("import check failed: {:.3f} s, loaded {}".format(import_time, ", ".join(heavy) or "no heavy module"))
+
+	for env_cls in [TokensEnv, TokensEnv2]:
+		baseline = bench_env(env_cls, 'array', args)
+		print("{:<12} {:<7} {:>12,.0f} steps/s".format(env_cls.__name__, 'array', baseline))
+		for obs_type in ['buffer', 'tuple', 'id']:
+			rate = bench_env(env_cls, obs_type, args)
+			print("{:<12} {:<7} {:>12,.0f} steps/s  x{:.2f}".format(env_cls.__name__, obs_type, rate, rate / baseline))
+
+	rate = bench_vec_env(args)
+	print("{:<12} {:<7} {:>12,.0f} steps/s".format('TokensVecEnv', args.num_envs, rate))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,168 @@
+import argparse
+import ast
+import csv
+import glob
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import gym
+import gym_tokens
+import numpy as np
+
+import lib
+import utils
+from gym_tokens.envs import TokensVecEnv, TokensVecEnv2, model
+
+# vectorized env used for Monte Carlo evaluation, tokens-v3/v4 pay 1 or 0 like TokensEnv with the default rewards
+# but discount them differently with fancy_discount, see FANCY_DISCOUNT_ENVS
+VEC_ENVS = {
+	'tokens-v0': TokensVecEnv,
+	'tokens-v1': TokensVecEnv2,
+	'tokens-v3': TokensVecEnv,
+	'tokens-v4': TokensVecEnv2,
+}
+# envs whose vectorized env only matches without fancy_discount
+FANCY_DISCOUNT_ENVS = ('tokens-v0', 'tokens-v1')
+
+_models = {}
+
+def _reward_kwargs(run_args):
+	# only TokensEnv and TokensVecEnv take a negative reward
+	return {'negative_reward': run_args.negative_reward} if run_args.env == 'tokens-v0' else {}
+
+def read_run_args(run_dir):
+	'''
+	Reads the arguments of a main.py run from the Namespace line of its log.txt.
+	: param run_dir (str) : directory of the run
+	: return (argparse.Namespace) : arguments of the run, None if they cannot be found
+	'''
+	path = os.path.join(run_dir, 'log.txt')
+	if not os.path.isfile(path):
+		return None
+	with open(path) as f:
+		for line in f:
+			if line.startswith('Namespace('):
+				call = ast.parse(line.strip(), mode='eval').body
+				return argparse.Namespace(**{kw.arg: ast.literal_eval(kw.value) for kw in call.keywords})
+	return None
+
+def find_checkpoints(run_dir):
+	'''
+	: return (list) : (games, path) of every q_mat_<games>.npy in the run, sorted by games
+	'''
+	checkpoints = []
+	for path in glob.glob(os.path.join(run_dir, 'q_mat_*.npy')):
+		match = re.search(r'q_mat_(\d+)\.npy$', path)
+		if match:
+			checkpoints.append((int(match.group(1)), path))
+	return sorted(checkpoints)
+
+def make_policy(args):
+	if args.policy == 'greedy':
+		return lib.GreedyPolicy(rng=args.seed)
+	elif args.policy == 'epsilon':
+		return lib.EpsilonGreedyPolicy(args.epsilon, rng=args.seed)
+	elif args.policy == 'softmax':
+		return lib.SoftmaxPolicy(args.temperature, rng=args.seed)
+	raise ValueError('policy should be one of: greedy, epsilon, softmax')
+
+def get_model(run_args):
+	'''
+	Exact model of the env of a run, shared by the runs a worker evaluates with the same settings.
+	'''
+	alpha = 0.25 if run_args.fast_block else 0.75
+	key = (run_args.env, alpha, run_args.height, run_args.fancy_discount, run_args.variation, run_args.negative_reward, run_args.reward)
+	if key not in _models:
+		env = gym.make(run_args.env, alpha=alpha, terminal=run_args.height, fancy_discount=run_args.fancy_discount, v=run_args.variation, **_reward_kwargs(run_args)).unwrapped
+		if hasattr(env, 'set_reward'):
+			env.set_reward(run_args.reward)
+		_models[key] = model.transition_model(env)
+	return _models[key]
+
+def make_vec_env(run_args, args):
+	alpha = 0.25 if run_args.fast_block else 0.75
+	vec_env_cls = VEC_ENVS[run_args.env]
+	vec_env = vec_env_cls(args.mc, alpha, seed=args.seed, terminal=run_args.height, fancy_discount=run_args.fancy_discount, v=run_args.variation, **_reward_kwargs(run_args))
+	if run_args.env in ('tokens-v0', 'tokens-v1'):
+		vec_env.set_reward(run_args.reward)
+	return vec_env
+
+def evaluate_run(run_dir, args):
+	'''
+	Evaluates every checkpoint of a run and writes its learning curve.
+	: return (tuple) : run directory, number of checkpoints evaluated and an error message or None
+	'''
+	run_args = read_run_args(run_dir)
+	if run_args is None:
+		return run_dir, 0, 'no arguments found in log.txt'
+
+	checkpoints = find_checkpoints(run_dir)
+	policy = make_policy(args)
+
+	if args.mc:
+		if run_args.env not in VEC_ENVS:
+			return run_dir, 0, 'no vectorized env for ' + run_args.env
+		if run_args.fancy_discount and run_args.env not in FANCY_DISCOUNT_ENVS:
+			return run_dir, 0, 'no vectorized env for ' + run_args.env + ' with fancy_discount'
+		vec_env = make_vec_env(run_args, args)
+		evaluate = lambda q_matrix: lib.simulate_q_table(vec_env, q_matrix, policy, rng=args.seed)
+	else:
+		try:
+			mdp = get_model(run_args)
+		except model.NotMarkovError as e:
+			return run_dir, 0, str(e) + ' (use --mc)'
+		evaluate = lambda q_matrix: lib.evaluate_q_table(mdp, q_matrix, policy)
+
+	header = ["games", "accuracy", "reward", "steps", "reward_rate", "decision_time", "no_choice"]
+	rows = []
+	for games, path in checkpoints:
+		result = evaluate(np.load(path))
+		decision_time = result['decision_time']
+		rows.append([games, result['accuracy'], result['reward'], result['steps'], result['reward_rate'],
+			np.dot(np.arange(len(decision_time)), decision_time), decision_time[0]])
+
+	with open(os.path.join(run_dir, args.output), 'w', newline='') as f:
+		writer = csv.writer(f)
+		writer.writerow(header)
+		writer.writerows(rows)
+
+	return run_dir, len(rows), None
+
+def main():
+
+	parser = argparse.ArgumentParser(description="evaluate the saved Q-tables of main.py runs and write a learning curve per run")
+	parser.add_argument("runs", nargs="*", default=["*"], help="run directories or patterns under the storage dir (default: all)")
+	parser.add_argument("--policy", default="greedy", help="policy acting on the Q-tables: greedy | epsilon | softmax")
+	parser.add_argument("--epsilon", type=float, default=0.01, help="epsilon of the epsilon-greedy policy")
+	parser.add_argument("--temperature", type=float, default=0.01, help="temperature of the softmax policy")
+	parser.add_argument("--mc", type=int, default=0, help="number of Monte Carlo games per Q-table (default: 0, exact evaluation)")
+	parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+	parser.add_argument("--output", default="learning_curve.csv", help="name of the file written in each run directory")
+	parser.add_argument("--seed", type=int, default=7, help="random seed (default: 7)")
+
+	args = parser.parse_args()
+
+	run_dirs = []
+	for pattern in args.runs:
+		if not os.path.isdir(pattern):
+			pattern = os.path.join(utils.get_storage_dir(), pattern)
+		run_dirs += [path for path in glob.glob(pattern) if find_checkpoints(path)]
+	run_dirs = sorted(set(run_dirs))
+	print("{} runs to evaluate".format(len(run_dirs)))
+
+	start_time = time.time()
+	with ProcessPoolExecutor(max_workers=args.workers) as executor:
+		futures = [executor.submit(evaluate_run, run_dir, args) for run_dir in run_dirs]
+		for future in as_completed(futures):
+			run_dir, num_checkpoints, error = future.result()
+			if error:
+				print("{}: skipped, {}".format(run_dir, error))
+			else:
+				print("{}: {} checkpoints".format(run_dir, num_checkpoints))
+
+	print("done in {:.1f}s".format(time.time() - start_time))
+
+if __name__ == '__main__':
+	main()
@@ -23,4 +23,14 @@ register(
 register(
 	id='tokens-v5',
 	entry_point='gym_tokens.envs:TokensEnvS'
-)
\ No newline at end of file
+)
+
+register(
+	id='tokens-vec-v0',
+	entry_point='gym_tokens.envs:TokensVecEnv'
+)
+
+register(
+	id='tokens-vec-v1',
+	entry_point='gym_tokens.envs:TokensVecEnv2'
+)
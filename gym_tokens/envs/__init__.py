@@ -2,4 +2,8 @@ from gym_tokens.envs.tokens_env import TokensEnv
 from gym_tokens.envs.tokens_env import TokensEnv2
 from gym_tokens.envs.tokens_env3 import TokensEnv3
 from gym_tokens.envs.tokens_env3 import TokensEnv4
-from gym_tokens.envs.token_env_stochastic import TokensEnvS
\ No newline at end of file
+from gym_tokens.envs.token_env_stochastic import TokensEnvS
+from gym_tokens.envs.token_env_stochastic import get_pt_plus_table
+from gym_tokens.envs.tokens_vec_env import TokensVecEnv
+from gym_tokens.envs.tokens_vec_env import TokensVecEnv2
+from gym_tokens.envs.model import TransitionModel
@@ -0,0 +1,242 @@
+'''
+Exact transition and reward model of the tokens envs.
+
+States are numbered like lib.Q_Table.get_stateID does for a table of shape
+(2T+1, 2T+1, T) and height T:
+
+	id = ((Nt + T) * (2T+1) + ht + T) * (T+1) + t
+
+and actions use the Q-table column order: 0 is wait, 1 is left (-1) and 2 is right (+1).
+'''
+from math import comb
+
+import numpy as np
+
+ACTIONS = np.array([0, -1, 1])
+
+class TransitionModel:
+	'''
+	Exact MDP of a tokens env.
+	P is kept in coordinate form: entry k moves state s[k] under action index a[k] to
+	next_state[k] with probability prob[k]. Transitions that end the game have no next
+	state, done[s, a] holds their probability and R[s, a] is the expected reward.
+	correct[s, a] is the probability that the game ends with the correct side chosen.
+	'''
+
+	def __init__(self, terminal, v, s, a, next_state, prob, R, done, correct, state_ids):
+		self.terminal = terminal
+		self.v = v
+		self.s = s
+		self.a = a
+		self.next_state = next_state
+		self.prob = prob
+		self.R = R
+		self.done = done
+		self.correct = correct
+		self.state_ids = state_ids
+		self.num_states, self.num_actions = R.shape
+		self.initial_state = state_id(0, 0, 0, terminal)
+
+	def get_P(self):
+		'''
+		This function returns the transitions as a sparse matrix.
+		: return (scipy.sparse.csr_matrix) : (num_states * num_actions, num_states) matrix, row s * num_actions + a
+		'''
+		from scipy import sparse
+		return sparse.csr_matrix((self.prob, (self.s * self.num_actions + self.a, self.next_state)), shape=(self.num_states * self.num_actions, self.num_states))
+
+	def decode(self, ids):
+		'''
+		This function maps state ids back to states.
+		: param ids (np.ndarray) : state ids
+		: return (np.ndarray) : (len(ids), 3) array of (Nt, ht, t)
+		'''
+		return decode_state_id(ids, self.terminal)
+
+def id_layout(terminal, shape=None):
+	'''
+	This function gives the strides and offset of the state ids of a Q-table, the only place the
+	numbering is defined: id = Nt * strides[0] + ht * strides[1] (+ t) + offset.
+	: param terminal (int) : height of the table, Nt and ht are shifted from [-terminal, terminal] to [0, 2*terminal]
+	: param shape (tuple) : shape of the lib.Q_Table, (num_Nt, num_ht, T) or (num_Nt, num_ht) for states without
+			a time step, by default (2T+1, 2T+1, T)
+	: return (tuple) : strides (tuple of int, one per state component), offset (int)
+	'''
+	if shape is None:
+		shape = (2*terminal + 1, 2*terminal + 1, terminal)
+	if len(shape) == 3:
+		strides = (shape[1] * (shape[2] + 1), shape[2] + 1, 1)
+	else:
+		strides = (shape[1], 1)
+	return strides, terminal * (strides[0] + strides[1])
+
+def state_id(Nt, ht, t, terminal):
+	'''
+	This function computes the Q-table id of a (Nt, ht, t) state.
+	: return (int or np.ndarray) : state id
+	'''
+	strides, offset = id_layout(terminal)
+	return Nt * strides[0] + ht * strides[1] + t + offset
+
+def decode_state_id(ids, terminal):
+	'''
+	Inverse of state_id.
+	: return (np.ndarray) : (len(ids), 3) array of (Nt, ht, t)
+	'''
+	ids = np.asarray(ids, dtype=np.int64)
+	rest, t = np.divmod(ids, terminal + 1)
+	Nt, ht = np.divmod(rest, 2*terminal + 1)
+	return np.stack([Nt - terminal, ht - terminal, t], axis=-1)
+
+class NotMarkovError(TypeError):
+	'''
+	Raised for the exact model of an env whose observation hides the time step.
+	'''
+
+def transition_model(env):
+	'''
+	This function returns the exact MDP of a tokens env.
+	Envs whose observation hides the time step (TokensEnv2, TokensEnv4, TokensVecEnv2) are not Markov and have no model.
+	: param env (gym.Env) : tokens env
+	: return (TransitionModel) : see env.get_transition_model
+	: raise NotMarkovError : for the envs without a model
+	'''
+	if getattr(env, 'get_transition_model', None) is None:
+		raise NotMarkovError('{} observations are not Markov, use the env with the time step in the state'.format(type(env.unwrapped).__name__))
+	return env.get_transition_model()
+
+def num_states(terminal):
+	return (2*terminal + 1) * (2*terminal + 1) * (terminal + 1)
+
+def outcome_probs(Nt, t, terminal):
+	'''
+	Probabilities that a fair walk at Nt after t tokens ends left or right of zero.
+	: return (tuple of np.ndarray) : P(N_T < 0), P(N_T > 0)
+	'''
+	Nt = np.asarray(Nt)
+	remaining = terminal - np.asarray(t)
+	pmf = np.zeros((terminal + 1, terminal + 1))
+	for k in range(terminal + 1):
+		pmf[k, :k+1] = [comb(k, b) / 2.0**k for b in range(k + 1)]
+
+	# number of right moves among the remaining tokens, N_T = Nt + 2b - remaining
+	b = np.arange(terminal + 1)
+	final = Nt[..., None] + 2 * b - remaining[..., None]
+	probs = pmf[remaining]
+	return np.sum(probs * (final < 0), axis=-1), np.sum(probs * (final > 0), axis=-1)
+
+def fancy_discount(reward, ht_prev, alpha, terminal):
+	'''
+	Vectorized TokensEnv._fancy_discount_reward.
+	: param ht_prev (np.ndarray) : choice stored in the state when the reward is paid
+	'''
+	inter_trial_interval = terminal / 2.0
+	ht_abs = np.absolute(ht_prev)
+	return reward / terminal / (ht_abs/terminal + alpha * (1 - ht_abs / terminal) + inter_trial_interval/terminal)
+
+def _walk_states(terminal):
+	'''
+	Every (Nt, t) a walk can reach.
+	'''
+	t = np.concatenate([np.full(k + 1, k) for k in range(terminal + 1)])
+	Nt = np.concatenate([np.arange(-k, k + 1, 2) for k in range(terminal + 1)])
+	return Nt, t
+
+def _horizon_states(terminal):
+	'''
+	Every (Nt, ht, t) of the horizon variation: ht is 0 or a choice made at time |ht|-1 < t.
+	'''
+	Nt, t = _walk_states(terminal)
+	choices = [np.concatenate([[0], np.arange(-k, 0), np.arange(1, k + 1)]) for k in range(terminal + 1)]
+	num_choices = np.array([len(choices[k]) for k in t])
+	ht = np.concatenate([choices[k] for k in t])
+	return np.repeat(Nt, num_choices), ht, np.repeat(t, num_choices)
+
+def _add_walk(entries, s, a, Nt, ht, t, terminal):
+	'''
+	Adds the two equally likely next states of a token move.
+	'''
+	for step in (-1, 1):
+		entries.append((s, np.full(len(s), a), state_id(Nt + step, ht, t + 1, terminal), np.full(len(s), 0.5)))
+
+def _to_model(terminal, v, entries, R, done, correct, state_ids):
+	s, a, next_state, prob = [np.concatenate(x) for x in zip(*entries)]
+	return TransitionModel(terminal, v, s, a, next_state, prob, R, done, correct, np.sort(state_ids))
+
+def terminate_model(terminal, commit_rewards):
+	'''
+	Model of the terminate variation: committing ends the game, waiting plays one token.
+	: param commit_rewards (callable) : commit_rewards(Nt, t, action) expected reward of committing to action at (Nt, t)
+	: return (TransitionModel)
+	'''
+	Nt, t = _walk_states(terminal)
+	ids = state_id(Nt, 0, t, terminal)
+	R = np.zeros((num_states(terminal), 3))
+	done = np.zeros((num_states(terminal), 3))
+	correct = np.zeros((num_states(terminal), 3))
+	entries = []
+
+	moving = t < terminal
+	_add_walk(entries, ids[moving], 0, Nt[moving], 0, t[moving], terminal)
+	done[ids[~moving], 0] = 1
+
+	correct[ids, 1], correct[ids, 2] = outcome_probs(Nt, t, terminal)
+	for index in (1, 2):
+		R[ids, index] = commit_rewards(Nt, t, ACTIONS[index])
+		done[ids, index] = 1
+
+	return _to_model(terminal, 'terminate', entries, R, done, correct, ids)
+
+def horizon_model(terminal, commit_rewards=None, end_rewards=None):
+	'''
+	Model of the horizon variation: every game plays all tokens, the choice is kept in ht.
+	: param commit_rewards (callable) : commit_rewards(Nt, t, action) expected reward paid at the step that commits
+	: param end_rewards (callable) : end_rewards(Nt, ht, ht_prev) reward paid at the last step, ht is the final choice
+	: return (TransitionModel)
+	'''
+	Nt, ht, t = _horizon_states(terminal)
+	ids = state_id(Nt, ht, t, terminal)
+	R = np.zeros((num_states(terminal), 3))
+	done = np.zeros((num_states(terminal), 3))
+	correct = np.zeros((num_states(terminal), 3))
+	entries = []
+
+	moving = t < terminal
+	for index in range(3):
+		next_ht = np.where(ht == 0, (t + 1) * ACTIONS[index], ht)
+		_add_walk(entries, ids[moving], index, Nt[moving], next_ht[moving], t[moving], terminal)
+		done[ids[~moving], index] = 1
+		correct[ids[~moving], index] = (next_ht[~moving] != 0) & (np.sign(Nt[~moving]) == np.sign(next_ht[~moving]))
+
+		if commit_rewards is not None and index:
+			commits = ht == 0
+			R[ids[commits], index] += commit_rewards(Nt[commits], t[commits], ACTIONS[index])
+		if end_rewards is not None:
+			R[ids[~moving], index] += end_rewards(Nt[~moving], next_ht[~moving], ht[~moving])
+
+	return _to_model(terminal, 'horizon', entries, R, done, correct, ids)
+
+def expected_choice_reward(Nt, t, action, terminal, reward=1, negative_reward=0.0, alpha=None):
+	'''
+	Expected reward of choosing a side at (Nt, t) when the reward is settled by the sign of N_T.
+	: param action (int) : -1 or 1
+	: param alpha (float) : if given the reward is fancy discounted with no previous choice
+	: return (np.ndarray) : expected rewards
+	'''
+	p_left, p_right = outcome_probs(Nt, t, terminal)
+	p_correct = p_right if action > 0 else p_left
+	expected = p_correct * reward + (1 - p_correct) * negative_reward
+	if alpha is not None:
+		expected = fancy_discount(expected, 0, alpha, terminal)
+	return expected
+
+def final_choice_reward(Nt, ht, ht_prev, terminal, reward=1, negative_reward=0.0, alpha=None):
+	'''
+	Reward at the end of a horizon game, nothing is paid when no choice was made.
+	: param alpha (float) : if given the reward is fancy discounted by ht_prev
+	: return (np.ndarray) : rewards
+	'''
+	rewards = np.where(np.sign(Nt) == np.sign(ht), reward, negative_reward).astype(np.float64)
+	if alpha is not None:
+		rewards = fancy_discount(rewards, ht_prev, alpha, terminal)
+	return np.where(ht == 0, 0.0, rewards)
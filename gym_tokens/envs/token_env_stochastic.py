@@ -4,19 +4,22 @@ from gym.utils import seeding
 import numpy as np
 import unittest
 
+from gym_tokens.envs import model
+
 class TokensEnvS(gym.Env):
 	metadata = {'render.modes': ['human']}
 
-	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate'):
+	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate', trajectory_block=1):
 		'''
 		This is the constructor for the tokens env.
 		: param alpha (float): discount factor
-		: param seed (int): random seed value
+		: param seed (int or np.random.SeedSequence): seed of the generator owned by this env
 		: param terminal (int): max time step for the environment
 		: param fancy_discount (boolean): uses fancy discounting to compute reward 
+		: param trajectory_block (int): number of future token walks drawn at once
 		'''
 
-		np.random.seed(seed)
+		self.rng = np.random.default_rng(seed)
 
 		self.num_actions = 3
 		# forward or backward in each dimension
@@ -31,6 +34,10 @@ class TokensEnvS(gym.Env):
 		self.fancy_discount = fancy_discount
 		self.trajectory = [0]
 		self.v = v
+		self.trajectory_block = trajectory_block
+		self._walks = WalkBlocks(terminal, trajectory_block)
+		self.p = 0.5
+		self.pt_plus_table = get_pt_plus_table(terminal, self.p)
 		self.reset()
 
 	def step(self, action):
@@ -71,7 +78,7 @@ class TokensEnvS(gym.Env):
 			next_state[1] = ht
 			is_done = True
 
-			reward = self.get_pt_plus(next_state[0], dec_time)
+			reward = self.pt_plus_table[next_state[0] + self.terminal, dec_time]
 
 			next_state[2] = dec_time
 			self.state = next_state
@@ -154,12 +161,19 @@ class TokensEnvS(gym.Env):
 		'''
 		return self.num_actions
 
+	def get_transition_model(self):
+		'''
+		This function exports the exact MDP of the environment over the Q-table state ids.
+		: return (TransitionModel) : sparse transitions and expected rewards, see gym_tokens.envs.model
+		'''
+		return model.terminate_model(self.terminal, lambda Nt, t, action: self.pt_plus_table[Nt + self.terminal, t])
+
 	def get_trajectory(self):
 		'''
 		This function returns the number of available actions of the environment.
 		: return (int) : number of actions
 		'''
-		return self.trajectory
+		return self.trajectory.tolist()
 
 	def reset(self):
 		'''
@@ -168,55 +182,107 @@ class TokensEnvS(gym.Env):
 		self.state = np.zeros(3, dtype=np.int64)
 		self.done = False
 		self.time_steps = 0
-		self.trajectory = [0]
 		self.set_trajectory()
 
 		return self.state, self.time_steps 
 
 	def set_trajectory(self):
-		Nt = self.state[0]
-		t = self.time_steps
-		while t < self.terminal:
-
-			if np.random.uniform() <= 0.5:
-				Nt -= 1
-			else:
-				Nt += 1
-
-			self.trajectory.append(Nt)
-			t += 1
+		'''
+		This function draws the token walk of the next game, trajectory_block games at a time (see WalkBlocks).
+		'''
+		self.trajectory = self._walks.next(self.rng)
 		
 	def binomial(self, n, k):
-		if 0 <= k <= n:
-			ntok = 1
-			ktok = 1
-			for t in range(1, min(k, n - k) + 1):
-				ntok *= n
-				ktok *= t
-				n -= 1
-			return ntok // ktok
-		else:
-			return 0
+		return _binomial(n, k)
 
 	def get_pt_plus(self, Nt, t, p=0.5):
 		'''
 		Outputs probability that reward>=0 at time T if state is Nt at time t, for +ve jump probability, p.
-		Behaves strangely for T a multiple of 10...
+		Values are read from the precomputed table when it covers the query.
 		'''
 		T = self.terminal
-		if t==-1:
-			return p
-		else:
-			tp = T - t 
-			Nt_plus=(t+Nt)/2.
-			if tp<(T-1)/2.-(t-Nt)/2.:
-				if Nt>0:
-					return 1
-				else:
-					return 0
-			else:
-				NL=(t-Nt)/2.
-				Nc=T-t
-				kvec=np.arange(0,(np.min((Nc,(T-1)/2-NL))+1))
-				return np.power(p,Nc)*np.sum(np.asarray([self.binomial(int(Nc), int(k)) for k in kvec]))
+		if p == self.p and -T <= Nt <= T and 0 <= t <= T:
+			return self.pt_plus_table[Nt + T, t]
+		return _pt_plus(Nt, t, T, p)
 
+
+class WalkBlocks:
+	'''
+	Token walks of the next games of an env, drawn block_size games at a time with a single
+	vectorized draw and handed out one per game.
+	'''
+
+	def __init__(self, terminal, block_size=1):
+		self.terminal = terminal
+		self.block_size = block_size
+		self._block = np.zeros((0, terminal + 1), dtype=np.int64)
+		self._index = 0
+
+	def next(self, rng):
+		'''
+		Returns the walk of the next game.
+		: param rng (np.random.Generator) : generator of the env, used when a new block is drawn
+		: return (np.ndarray) : terminal+1 token differences, starting at 0
+		'''
+		if self._index == len(self._block):
+			steps = np.where(rng.random(size=(self.block_size, self.terminal)) <= 0.5, -1, 1)
+			self._block = np.zeros((self.block_size, self.terminal + 1), dtype=np.int64)
+			np.cumsum(steps, axis=1, out=self._block[:, 1:])
+			self._index = 0
+
+		walk = self._block[self._index]
+		self._index += 1
+		return walk
+
+_PT_PLUS_TABLES = {}
+
+def get_pt_plus_table(terminal, p=0.5):
+	'''
+	Returns TokensEnvS.get_pt_plus for every state as a read-only array indexed by [Nt + terminal, t].
+	Tables are built once per (terminal, p) and shared by every env of the process.
+	: param terminal (int) : max time step for the environment
+	: param p (float) : +ve jump probability
+	: return (np.ndarray) : (2*terminal+1, terminal+1) table
+	'''
+	key = (terminal, p)
+	if key not in _PT_PLUS_TABLES:
+		table = np.zeros((2*terminal+1, terminal+1))
+		for Nt in range(-terminal, terminal+1):
+			for t in range(terminal+1):
+				table[Nt + terminal, t] = _pt_plus(Nt, t, terminal, p)
+		table.flags.writeable = False
+		_PT_PLUS_TABLES[key] = table
+	return _PT_PLUS_TABLES[key]
+
+def _binomial(n, k):
+	if 0 <= k <= n:
+		ntok = 1
+		ktok = 1
+		for t in range(1, min(k, n - k) + 1):
+			ntok *= n
+			ktok *= t
+			n -= 1
+		return ntok // ktok
+	else:
+		return 0
+
+def _pt_plus(Nt, t, T, p):
+	'''
+	Outputs probability that reward>=0 at time T if state is Nt at time t, for +ve jump probability, p.
+	Behaves strangely for T a multiple of 10...
+	'''
+	if t==-1:
+		return p
+	else:
+		tp = T - t 
+		Nt_plus=(t+Nt)/2.
+		if tp<(T-1)/2.-(t-Nt)/2.:
+			if Nt>0:
+				return 1
+			else:
+				return 0
+		else:
+			NL=(t-Nt)/2.
+			Nc=T-t
+			kvec=np.arange(0,(np.min((Nc,(T-1)/2-NL))+1))
+			return np.power(p,Nc)*np.sum(np.asarray([_binomial(int(Nc), int(k)) for k in kvec]))
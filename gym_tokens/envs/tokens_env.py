@@ -5,28 +5,175 @@ import numpy as np
 import unittest
 import time
 
-class TokensEnv(gym.Env):
+from gym_tokens.envs import model
+from gym_tokens.rng import BufferedRNG
+
+class _FastStep:
+	'''
+	Code shared by TokensEnv and TokensEnv2: the step in plain ints used when obs_type is not 'array',
+	where the envs only differ in whether the observation has the time step, and the trajectory of a game.
+	'''
+
+	# whether the time step is the last component of the observation
+	observe_time = True
+
+	def _init_obs(self, obs_type, terminal):
+		'''
+		Checks obs_type and sets up the 'buffer' and 'id' observations.
+		: param obs_type (str) : see the constructor of the env
+		: param terminal (int) : max time step for the environment
+		'''
+		if obs_type not in ('array', 'buffer', 'tuple', 'id'):
+			raise ValueError('obs_type should be one of: array, buffer, tuple, id')
+		self.obs_type = obs_type
+
+		# same ids as a Q_Table of height terminal, (Nt, ht) ones have a time stride of 0
+		shape = (2*terminal + 1, 2*terminal + 1, terminal)[:3 if self.observe_time else 2]
+		strides, self._id_offset = model.id_layout(terminal, shape)
+		self._id_strides = strides if self.observe_time else strides + (0,)
+		self._obs = np.zeros(len(shape), dtype=np.int64)
+		if obs_type == 'id':
+			self.observation_space = spaces.Discrete(model.num_states(terminal) if self.observe_time else shape[0] * shape[1])
+
+	def _step_fast(self, action):
+		'''
+		Same transition as _step_v_terminate and _step_v_horizon, used when obs_type is not 'array'.
+		The state is kept in plain ints and the reward is computed without the _sign asserts; the render counters of TokensEnv are not updated.
+		: param action :(integer consisting of [-1,0,1])
+		: return next state, reward, is_done (boolean) and in-game time steps
+		'''
+
+		if action >1 or action <-1:
+			raise Exception('action should belong to this set: [-1,0,1]')
+
+		Nt = self._Nt
+		ht_prev = self._ht
+		ht = ht_prev if ht_prev else (self.time_steps+1) * int(action)
+		reward = 0
+		is_done = False
+
+		if self.v == 'terminate':
+			if ht:
+				obs_time = self.time_steps
+				reward = self._fast_reward(int(self._fast_forward(Nt)), ht, ht_prev)
+				is_done = True
+			else:
+				if self.time_steps < self.terminal:
+					Nt = Nt - 1 if self.rng.random() <= 0.5 else Nt + 1
+					self.trajectory.append(Nt)
+					self.time_steps += 1
+				else:
+					is_done = True
+				obs_time = self.time_steps
+
+		else:
+			if self.time_steps < self.terminal:
+				Nt = Nt - 1 if self.rng.random() <= 0.5 else Nt + 1
+				self.trajectory.append(Nt)
+
+			if self.time_steps == self.terminal:
+				is_done = True
+				if ht:
+					reward = self._fast_reward(Nt, ht, ht_prev)
+			else:
+				self.time_steps += 1
+			obs_time = self.time_steps
+
+		self._Nt = Nt
+		self._ht = ht
+		return self._observe(Nt, ht, obs_time), reward, is_done, self.time_steps
+
+	def _fast_reward(self, Nt, ht, ht_prev):
+		'''
+		Reward of a choice with plain ints, same values as _indicator and _fancy_discount_reward.
+		: param Nt (int) : token difference at the end of the game
+		: param ht (int) : choice
+		: param ht_prev (int) : choice stored in the state before this step
+		: return reward
+		'''
+		reward = self.reward if Nt * ht > 0 else self.negative_reward
+		if self.fancy_discount:
+			ht_abs = abs(ht_prev)
+			inter_trial_interval = self.terminal / 2.0
+			reward = reward / self.terminal / (ht_abs/self.terminal + self.alpha * (1 - ht_abs / self.terminal) + inter_trial_interval/self.terminal)
+		return reward
+
+	def _observe(self, Nt, ht, obs_time):
+		if self.obs_type == 'id':
+			return Nt * self._id_strides[0] + ht * self._id_strides[1] + obs_time * self._id_strides[2] + self._id_offset
+		if self.obs_type == 'tuple':
+			return (Nt, ht, obs_time) if self.observe_time else (Nt, ht)
+		obs = self._obs
+		obs[0] = Nt
+		obs[1] = ht
+		if self.observe_time:
+			obs[2] = obs_time
+		return obs
+
+	def get_trajectory(self):
+		'''
+		This function returns the token differences of the current game, from 0 at time 0.
+		: return (list) : token difference after every token
+		: raise ValueError : if the env was created with record_trajectory=False
+		'''
+		if not self.record_trajectory:
+			raise ValueError('the trajectory is not recorded, create the env with record_trajectory=True or use get_final_token_difference')
+		return self.trajectory
+
+	def get_final_token_difference(self):
+		'''
+		This function returns N_T of the current game, known once the game is over.
+		: return (int) : token difference at the end of the game
+		'''
+		return self.trajectory[-1]
+
+	def _fast_forward(self, Nt):
+		'''
+		Plays the remaining tokens of the game at once after a decision in the terminate variation.
+		The walk is drawn in one call and appended to the trajectory, or only the final token
+		difference is drawn from a binomial when the trajectory is not recorded (see get_trajectory).
+		: param Nt (int) : token difference at the decision time
+		: return (int) : token difference at the end of the game
+		'''
+		remaining = self.terminal - self.time_steps
+		if remaining > 0:
+			if self.record_trajectory:
+				walk = Nt + np.cumsum(np.where(self.rng.random(size=remaining) <= 0.5, -1, 1))
+				self.trajectory.extend(walk)
+				Nt = walk[-1]
+			else:
+				Nt = Nt + 2 * self.rng.binomial(remaining, 0.5) - remaining
+				self.trajectory.append(Nt)
+			self.time_steps = self.terminal
+		return Nt
+
+class TokensEnv(_FastStep, gym.Env):
 
 	metadata = {
 		'render.modes': ['human', 'rgb_array'],
 		'video.frames_per_second': 50
 		}
 
-	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, negative_reward=0.0, v='terminate'):
+	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, negative_reward=0.0, v='terminate', record_trajectory=True, obs_type='array'):
 		'''
 		This is the constructor for the tokens env.
 		: param alpha (float): discount factor
-		: param seed (int): random seed value
+		: param seed (int or np.random.SeedSequence): seed of the buffered generator owned by this env (see gym_tokens.rng)
 		: param terminal (int): max time step for the environment
 		: param fancy_discount (boolean): uses fancy discounting to compute reward 
+		: param record_trajectory (boolean): keep every token of the walk for get_trajectory, otherwise only N_T is drawn after an early decision
+		: param obs_type (str): 'array' returns a new state array per step, 'buffer' overwrites one preallocated
+			array, 'tuple' returns plain ints and 'id' the Q-table state id (see lib.Q_Table.encode);
+			the last three skip the per-step allocations and asserts
 		'''
 
-		np.random.seed(seed)
+		self.rng = BufferedRNG(seed)
 
 		self.num_actions = 3
 		# forward or backward in each dimension
 		self.action_space = spaces.Discrete(3)
 		self.observation_space = spaces.Box(low=np.array([-terminal, -terminal, 0]), high=np.array([terminal, terminal, terminal]), dtype=np.int64)
+		self._init_obs(obs_type, terminal)
 
 		
 		# initial condition
@@ -39,10 +186,13 @@ class TokensEnv(gym.Env):
 		self.fancy_discount = fancy_discount
 		self.trajectory = [0]
 		self.v = v
+		self.record_trajectory = record_trajectory
 		self.viewer = None
 		self.negative_reward = negative_reward
 
 	def step(self, action):
+		if self.obs_type != 'array':
+			return self._step_fast(action)
 		if self.v == 'terminate':
 			return self._step_v_terminate(action)
 		elif self.v == 'horizon':
@@ -83,17 +233,7 @@ class TokensEnv(gym.Env):
 			
 			next_state[0] = Nt # set n before
 
-			while self.time_steps < self.terminal:
-
-				if np.random.uniform() <= 0.5:
-					Nt -= 1
-					# self.counter[0] += 1
-				else:
-					Nt += 1
-					# self.counter[2] += 1
-
-				self.trajectory.append(Nt)
-				self.time_steps += 1
+			Nt = self._fast_forward(Nt)
 
 			is_done = True
 
@@ -113,7 +253,7 @@ class TokensEnv(gym.Env):
 		else:
 
 			if self.time_steps < self.terminal:
-				if np.random.uniform() <= 0.5:
+				if self.rng.random() <= 0.5:
 					Nt -= 1
 					self.counter[0] += 1
 				else:
@@ -163,7 +303,7 @@ class TokensEnv(gym.Env):
 		#Go left if prob is less than 0.5, go right otherwise if in-game time-steps less than max time-step
 		if self.time_steps < self.terminal:
 
-			if np.random.uniform() <= 0.5:
+			if self.rng.random() <= 0.5:
 				Nt = Nt_prev - 1
 
 			else:
@@ -267,12 +407,17 @@ class TokensEnv(gym.Env):
 		'''
 		return self.num_actions
 
-	def get_trajectory(self):
+	def get_transition_model(self):
 		'''
-		This function returns the number of available actions of the environment.
-		: return (int) : number of actions
+		This function exports the exact MDP of the environment over the Q-table state ids.
+		: return (TransitionModel) : sparse transitions and expected rewards, see gym_tokens.envs.model
 		'''
-		return self.trajectory
+		alpha = self.alpha if self.fancy_discount else None
+		if self.v == 'terminate':
+			return model.terminate_model(self.terminal,
+				lambda Nt, t, action: model.expected_choice_reward(Nt, t, action, self.terminal, self.reward, self.negative_reward, alpha))
+		return model.horizon_model(self.terminal,
+			end_rewards=lambda Nt, ht, ht_prev: model.final_choice_reward(Nt, ht, ht_prev, self.terminal, self.reward, self.negative_reward, alpha))
 
 	def set_reward(self, reward):
 		self.reward = reward
@@ -297,10 +442,10 @@ class TokensEnv(gym.Env):
 			self.coords_list = []
 
 			while len(self.coords_list) < num_tokens:
-				coords = np.random.choice(self.num_range, 2)
+				coords = self.rng.choice(self.num_range, 2)
 
 				while coords[0]**2 + coords[1]**2 > radius**2:
-					coords = np.random.choice(self.num_range, 2)
+					coords = self.rng.choice(self.num_range, 2)
 				
 				self.coords_list.append(coords)
 				self.coords_list = [list(x) for x in {(tuple(e)) for e in self.coords_list}]
@@ -368,28 +513,41 @@ class TokensEnv(gym.Env):
 		self.done = False
 		self.time_steps = 0
 		self.trajectory = [0]
+		self._Nt = 0
+		self._ht = 0
 
+		if self.obs_type != 'array':
+			return self._observe(0, 0, 0), self.time_steps
 		return self.state, self.time_steps 
 
 
-class TokensEnv2(gym.Env):
+class TokensEnv2(_FastStep, gym.Env):
+	# fixed rewards of a choice, TokensEnv takes them as arguments
+	reward = 1
+	negative_reward = 0
+	observe_time = False
 	metadata = {'render.modes': ['human']}
 
-	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate'):
+	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate', record_trajectory=True, obs_type='array'):
 		'''
 		This is the constructor for the tokens env.
 		: param alpha (float): discount factor
-		: param seed (int): random seed value
+		: param seed (int or np.random.SeedSequence): seed of the buffered generator owned by this env (see gym_tokens.rng)
 		: param terminal (int): max time step for the environment
 		: param fancy_discount (boolean): uses fancy discounting to compute reward 
+		: param record_trajectory (boolean): keep every token of the walk for get_trajectory, otherwise only N_T is drawn after an early decision
+		: param obs_type (str): 'array' returns a new state array per step, 'buffer' overwrites one preallocated
+			array, 'tuple' returns plain ints and 'id' the Q-table state id (see lib.Q_Table.encode);
+			the last three skip the per-step allocations and asserts
 		'''
 
-		np.random.seed(seed)
+		self.rng = BufferedRNG(seed)
 
 		self.num_actions = 3
 		# forward or backward in each dimension
 		self.action_space = spaces.Discrete(3)
 		self.observation_space = spaces.Box(low=np.array([-terminal+1, -terminal+1]), high=np.array([terminal+1, terminal+1]), dtype=np.int64)
+		self._init_obs(obs_type, terminal)
 		
 		# initial condition
 		self.state = np.zeros(2) #index 0: Nt, index 1: ht
@@ -399,9 +557,11 @@ class TokensEnv2(gym.Env):
 		self.fancy_discount = fancy_discount
 		self.trajectory = [0]
 		self.v = v
+		self.record_trajectory = record_trajectory
 
 	def step(self, action):
-
+		if self.obs_type != 'array':
+			return self._step_fast(action)
 		if self.v == 'terminate':
 			return self._step_v_terminate(action)
 		elif self.v == 'horizon':
@@ -442,15 +602,7 @@ class TokensEnv2(gym.Env):
 			
 			next_state[0] = Nt # set n before
 
-			while self.time_steps < self.terminal:
-
-				if np.random.uniform() <= 0.5:
-					Nt -= 1
-				else:
-					Nt += 1
-
-				self.trajectory.append(Nt)
-				self.time_steps += 1
+			Nt = self._fast_forward(Nt)
 
 			is_done = True
 
@@ -469,7 +621,7 @@ class TokensEnv2(gym.Env):
 		else:
 
 			if self.time_steps < self.terminal:
-				if np.random.uniform() <= 0.5:
+				if self.rng.random() <= 0.5:
 					Nt -= 1
 				else:
 					Nt += 1
@@ -515,7 +667,7 @@ class TokensEnv2(gym.Env):
 		#Go left if prob is less than 0.5, go right otherwise if in-game time-steps less than max time-step
 		if self.time_steps < self.terminal:
 
-			if np.random.uniform() <= 0.5:
+			if self.rng.random() <= 0.5:
 				Nt = Nt_prev - 1
 
 			else:
@@ -617,13 +769,6 @@ class TokensEnv2(gym.Env):
 		'''
 		return self.num_actions
 
-	def get_trajectory(self):
-		'''
-		This function returns the number of available actions of the environment.
-		: return (int) : number of actions
-		'''
-		return self.trajectory
-
 	# Taken from: https://github.com/openai/gym/blob/master/gym/envs/classic_control/cartpole.py
 	def render(self, mode='human'):
 		screen_width = 600
@@ -666,5 +811,9 @@ class TokensEnv2(gym.Env):
 		self.done = False
 		self.time_steps = 0
 		self.trajectory = [0]
+		self._Nt = 0
+		self._ht = 0
 
+		if self.obs_type != 'array':
+			return self._observe(0, 0, 0), self.time_steps
 		return self.state, self.time_steps
\ No newline at end of file
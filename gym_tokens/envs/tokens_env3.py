@@ -4,19 +4,23 @@ from gym.utils import seeding
 import numpy as np
 import unittest
 
+from gym_tokens.envs import model
+from gym_tokens.envs.token_env_stochastic import WalkBlocks
+
 class TokensEnv3(gym.Env):
 	metadata = {'render.modes': ['human']}
 
-	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate'):
+	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate', trajectory_block=1):
 		'''
 		This is the constructor for the tokens env.
 		: param alpha (float): discount factor
-		: param seed (int): random seed value
+		: param seed (int or np.random.SeedSequence): seed of the generator owned by this env
 		: param terminal (int): max time step for the environment
 		: param fancy_discount (boolean): uses fancy discounting to compute reward 
+		: param trajectory_block (int): number of future token walks drawn at once
 		'''
 
-		np.random.seed(seed)
+		self.rng = np.random.default_rng(seed)
 
 		self.num_actions = 3
 		# forward or backward in each dimension
@@ -30,6 +34,8 @@ class TokensEnv3(gym.Env):
 		self.terminal = terminal
 		self.fancy_discount = fancy_discount
 		self.v = v
+		self.trajectory_block = trajectory_block
+		self._walks = WalkBlocks(terminal, trajectory_block)
 		self.took_action = False
 		self.reward = 0
 		self.reset()
@@ -225,25 +231,29 @@ class TokensEnv3(gym.Env):
 		'''
 		return self.num_actions
 
+	def get_transition_model(self):
+		'''
+		This function exports the exact MDP of the environment over the Q-table state ids.
+		: return (TransitionModel) : sparse transitions and expected rewards, see gym_tokens.envs.model
+		'''
+		alpha = self.alpha if self.fancy_discount else None
+		commit_rewards = lambda Nt, t, action: model.expected_choice_reward(Nt, t, action, self.terminal, alpha=alpha)
+		if self.v == 'terminate':
+			return model.terminate_model(self.terminal, commit_rewards)
+		return model.horizon_model(self.terminal, commit_rewards=commit_rewards)
+
 	def get_trajectory(self):
 		'''
 		This function returns the number of available actions of the environment.
 		: return (int) : number of actions
 		'''
-		return self.trajectory
+		return self.trajectory.tolist()
 
 	def set_trajectory(self):
-		Nt = self.state[0]
-		t = self.time_steps
-		while t < self.terminal:
-
-			if np.random.uniform() <= 0.5:
-				Nt -= 1
-			else:
-				Nt += 1
-
-			self.trajectory.append(Nt)
-			t += 1
+		'''
+		This function draws the token walk of the next game, trajectory_block games at a time (see WalkBlocks).
+		'''
+		self.trajectory = self._walks.next(self.rng)
 
 	def reset(self):
 		'''
@@ -254,7 +264,6 @@ class TokensEnv3(gym.Env):
 		self.took_action = False
 		self.time_steps = 0
 		self.reward = 0
-		self.trajectory = [0]
 		self.set_trajectory()
 		return self.state, self.time_steps 
 
@@ -262,16 +271,17 @@ class TokensEnv3(gym.Env):
 class TokensEnv4(gym.Env):
 	metadata = {'render.modes': ['human']}
 
-	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate'):
+	def __init__(self, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate', trajectory_block=1):
 		'''
 		This is the constructor for the tokens env.
 		: param alpha (float): discount factor
-		: param seed (int): random seed value
+		: param seed (int or np.random.SeedSequence): seed of the generator owned by this env
 		: param terminal (int): max time step for the environment
 		: param fancy_discount (boolean): uses fancy discounting to compute reward 
+		: param trajectory_block (int): number of future token walks drawn at once
 		'''
 
-		np.random.seed(seed)
+		self.rng = np.random.default_rng(seed)
 
 		self.num_actions = 3
 		# forward or backward in each dimension
@@ -287,6 +297,8 @@ class TokensEnv4(gym.Env):
 		self.reward = 0
 		self.trajectory = [0]
 		self.v = v
+		self.trajectory_block = trajectory_block
+		self._walks = WalkBlocks(terminal, trajectory_block)
 		self.reset()
 
 	def step(self, action):
@@ -484,20 +496,13 @@ class TokensEnv4(gym.Env):
 		This function returns the number of available actions of the environment.
 		: return (int) : number of actions
 		'''
-		return self.trajectory
+		return self.trajectory.tolist()
 
 	def set_trajectory(self):
-		Nt = self.state[0]
-		t = self.time_steps
-		while t < self.terminal:
-
-			if np.random.uniform() <= 0.5:
-				Nt -= 1
-			else:
-				Nt += 1
-
-			self.trajectory.append(Nt)
-			t += 1
+		'''
+		This function draws the token walk of the next game, trajectory_block games at a time (see WalkBlocks).
+		'''
+		self.trajectory = self._walks.next(self.rng)
 
 	def reset(self):
 		'''
@@ -508,6 +513,5 @@ class TokensEnv4(gym.Env):
 		self.took_action = False
 		self.time_steps = 0
 		self.reward = 0
-		self.trajectory = [0]
 		self.set_trajectory()
 		return self.state, self.time_steps 
@@ -0,0 +1,218 @@
+import gym
+from gym import spaces
+import numpy as np
+
+from gym_tokens.envs import model, walks
+
+class TokensVecEnv(gym.Env):
+	'''
+	Vectorized version of TokensEnv that plays num_envs independent games in lockstep.
+	States, actions, rewards and done flags are NumPy arrays with one row per game, and
+	finished games are reset in place so the batch never shrinks. The token walk of every
+	game is drawn at reset and kept packed in one uint64 (see gym_tokens.envs.walks).
+	'''
+
+	metadata = {'render.modes': []}
+
+	def __init__(self, num_envs, alpha, seed=7, terminal=3, fancy_discount=False, negative_reward=0.0, v='terminate'):
+		'''
+		This is the constructor for the vectorized tokens env.
+		: param num_envs (int): number of games stepped at once
+		: param alpha (float): discount factor
+		: param seed (int or np.random.SeedSequence): seed of the generator owned by this env
+		: param terminal (int): max time step for the environment
+		: param fancy_discount (boolean): uses fancy discounting to compute reward
+		: param negative_reward (float): reward for a wrong choice
+		: param v (str): 'terminate' or 'horizon' variation
+		'''
+
+		if v not in ('terminate', 'horizon'):
+			raise ValueError('v should be one of: terminate, horizon')
+		walks.check_terminal(terminal)
+
+		self.rng = np.random.default_rng(seed)
+
+		self.num_envs = num_envs
+		self.num_actions = 3
+		# spaces of a single game, the batch adds a leading num_envs axis
+		self.action_space = spaces.Discrete(3)
+		self.observation_space = spaces.Box(low=np.array([-terminal, -terminal, 0]), high=np.array([terminal, terminal, terminal]), dtype=np.int64)
+
+		self.alpha = alpha
+		self.reward = 1
+		self.negative_reward = negative_reward
+		self.terminal = terminal
+		self.fancy_discount = fancy_discount
+		self.v = v
+		self._rows = np.arange(num_envs)
+		self.reset()
+
+	def step(self, actions):
+		'''
+		Steps every game once.
+		: param actions (np.ndarray): (num_envs,) integers in [-1,0,1]
+		: return next states, rewards, is_done mask and in-game time steps, one row per game.
+		For finished games the returned row is the final transition of the game, while
+		self.state already holds the initial state of the next one.
+		'''
+
+		actions = np.asarray(actions, dtype=np.int64)
+		if np.any((actions > 1) | (actions < -1)):
+			raise Exception('action should belong to this set: [-1,0,1]')
+
+		ht_prev = self.state[:, 1]
+		t = self.state[:, 2]
+
+		#Play action if all previous actions are waiting (action = 0). Else, preserve previous played actions
+		ht = np.where(ht_prev == 0, (t + 1) * actions, ht_prev)
+		rewards = np.zeros(self.num_envs)
+
+		if self.v == 'terminate':
+			committed = ht != 0
+			moving = ~committed & (t < self.terminal)
+			is_done = ~moving
+
+			# committed games keep the decision time, the rest of their walk is already drawn
+			next_t = t + moving
+			time_steps = np.where(committed, self.terminal, next_t)
+			rewarded = committed
+
+		else:
+			is_done = t == self.terminal
+			next_t = np.minimum(t + 1, self.terminal)
+			time_steps = next_t
+			rewarded = is_done & (ht != 0)
+
+		next_states = np.empty((self.num_envs, 3), dtype=np.int64)
+		next_states[:, 0] = walks.token_difference(self.walks, next_t)
+		next_states[:, 1] = ht
+		next_states[:, 2] = next_t
+
+		if np.any(rewarded):
+			final_Nt = walks.token_difference(self.walks[rewarded], self.terminal)
+			rewards[rewarded] = self._get_rewards(final_Nt, ht[rewarded], ht_prev[rewarded])
+
+		self.state = next_states.copy()
+
+		done_rows = np.flatnonzero(is_done)
+		if len(done_rows):
+			self.last_walks[done_rows] = self.walks[done_rows]
+			self._reset_rows(done_rows)
+
+		return self._observe(next_states), rewards, is_done, time_steps
+
+	def _get_rewards(self, Nt, ht, ht_prev):
+		'''
+		Rewards of the games that made a choice, same rule as TokensEnv._indicator and _fancy_discount_reward.
+		: param Nt (np.ndarray) : token difference at the end of the game
+		: param ht (np.ndarray) : choice of the games
+		: param ht_prev (np.ndarray) : choice stored in the state before this step
+		: return (np.ndarray) : rewards
+		'''
+		rewards = np.where(np.sign(Nt) == np.sign(ht), self.reward, self.negative_reward).astype(np.float64)
+
+		if self.fancy_discount:
+			inter_trial_interval = self.terminal / 2.0
+			ht_abs = np.absolute(ht_prev)
+			rewards = rewards / self.terminal / (ht_abs/self.terminal + self.alpha * (1 - ht_abs / self.terminal) + inter_trial_interval/self.terminal)
+
+		return rewards
+
+	def _observe(self, states):
+		return states
+
+	def _reset_rows(self, rows):
+		'''
+		Starts new games in the given rows and draws their full token walk.
+		: param rows (np.ndarray) : indices of the games to reset
+		'''
+		self.state[rows] = 0
+		self.walks[rows] = walks.sample_walks(self.rng, len(rows), self.terminal)
+
+	def get_num_states(self):
+		'''
+		This function computes the total number of states
+		: return (int) : total number of states
+		'''
+		return len(range(-self.terminal,self.terminal+1))*len(range(-self.terminal,self.terminal+1))*len(range(self.terminal+1))
+
+	def get_num_actions(self):
+		'''
+		This function returns the number of available actions of the environment.
+		: return (int) : number of actions
+		'''
+		return self.num_actions
+
+	def get_transition_model(self):
+		'''
+		This function exports the exact MDP of a single game, same as TokensEnv.get_transition_model.
+		: return (TransitionModel) : sparse transitions and expected rewards, see gym_tokens.envs.model
+		'''
+		alpha = self.alpha if self.fancy_discount else None
+		if self.v == 'terminate':
+			return model.terminate_model(self.terminal,
+				lambda Nt, t, action: model.expected_choice_reward(Nt, t, action, self.terminal, self.reward, self.negative_reward, alpha))
+		return model.horizon_model(self.terminal,
+			end_rewards=lambda Nt, ht, ht_prev: model.final_choice_reward(Nt, ht, ht_prev, self.terminal, self.reward, self.negative_reward, alpha))
+
+	def get_trajectory(self, index):
+		'''
+		This function returns the token walk of the last finished game in a row.
+		: param index (int) : row of the game
+		: return (list) : token difference at every time step
+		'''
+		return walks.unpack_walks(self.last_walks[index], self.terminal)[0].tolist()
+
+	def get_final_token_difference(self, rows):
+		'''
+		This function returns N_T of the last finished game in some rows.
+		: param rows (np.ndarray) : rows of the games
+		: return (np.ndarray) : token difference at the end of every game
+		'''
+		return walks.token_difference(self.last_walks[rows], self.terminal)
+
+	def set_reward(self, reward):
+		self.reward = reward
+
+	def reset(self):
+		'''
+		This function resets every game by setting the states, time_steps to zero
+		'''
+		self.state = np.zeros((self.num_envs, 3), dtype=np.int64)
+		self.walks = np.zeros(self.num_envs, dtype=np.uint64)
+		self.last_walks = np.zeros(self.num_envs, dtype=np.uint64)
+		self._reset_rows(self._rows)
+
+		return self._observe(self.state), self.state[:, 2].copy()
+
+
+class TokensVecEnv2(TokensVecEnv):
+	'''
+	Vectorized version of TokensEnv2, the time step is hidden from the observation.
+	'''
+
+	def __init__(self, num_envs, alpha, seed=7, terminal=3, fancy_discount=False, v='terminate'):
+		'''
+		This is the constructor for the vectorized tokens env.
+		: param num_envs (int): number of games stepped at once
+		: param alpha (float): discount factor
+		: param seed (int or np.random.SeedSequence): seed of the generator owned by this env
+		: param terminal (int): max time step for the environment
+		: param fancy_discount (boolean): uses fancy discounting to compute reward
+		: param v (str): 'terminate' or 'horizon' variation
+		'''
+		super().__init__(num_envs, alpha, seed=seed, terminal=terminal, fancy_discount=fancy_discount, v=v)
+		self.observation_space = spaces.Box(low=np.array([-terminal+1, -terminal+1]), high=np.array([terminal+1, terminal+1]), dtype=np.int64)
+
+	def _observe(self, states):
+		return states[:, :2]
+
+	def get_num_states(self):
+		'''
+		This function computes the total number of states
+		: return (int) : total number of states
+		'''
+		return len(range(-self.terminal,self.terminal+1))*len(range(-self.terminal,self.terminal+1))
+
+	# the observation hides the time step, so it is not a Markov state and has no exact model (see model.transition_model)
+	get_transition_model = None
@@ -0,0 +1,91 @@
+'''
+Token walks packed as bits.
+
+With a fair coin the walk of a game of height T is T random bits: bit i is set when
+token i+1 moves right (+1) and clear when it moves left (-1). A whole walk fits in one
+uint64, and the token difference at time t is 2 * popcount(bits & mask_t) - t.
+'''
+import numpy as np
+
+MAX_TERMINAL = 64
+
+# _MASKS[t] keeps the bits of the first t tokens
+_MASKS = np.array([(1 << t) - 1 for t in range(MAX_TERMINAL + 1)], dtype=np.uint64)
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+def _popcount_swar(x):
+	x = x - ((x >> np.uint64(1)) & _M1)
+	x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+	x = (x + (x >> np.uint64(4))) & _M4
+	return (x * _H01) >> np.uint64(56)
+
+if hasattr(np, 'bitwise_count'):
+	def popcount(x):
+		'''
+		Number of set bits of every element.
+		: param x (np.ndarray) : uint64 array
+		: return (np.ndarray) : bit counts
+		'''
+		return np.bitwise_count(x).astype(np.int64)
+else:
+	def popcount(x):
+		'''
+		Number of set bits of every element.
+		: param x (np.ndarray) : uint64 array
+		: return (np.ndarray) : bit counts
+		'''
+		return _popcount_swar(np.asarray(x, dtype=np.uint64)).astype(np.int64)
+
+def check_terminal(terminal):
+	if not 0 <= terminal <= MAX_TERMINAL:
+		raise ValueError('packed walks hold at most {} tokens, got terminal={}'.format(MAX_TERMINAL, terminal))
+
+def sample_walks(rng, num_walks, terminal):
+	'''
+	Draws fair token walks in bulk.
+	: param rng (np.random.Generator) : generator to draw from
+	: param num_walks (int) : number of walks
+	: param terminal (int) : number of tokens per walk, at most MAX_TERMINAL
+	: return (np.ndarray) : (num_walks,) uint64 packed walks
+	'''
+	check_terminal(terminal)
+	if terminal == 0:
+		return np.zeros(num_walks, dtype=np.uint64)
+	return rng.integers(0, int(_MASKS[terminal]), size=num_walks, dtype=np.uint64, endpoint=True)
+
+def token_difference(walks, t):
+	'''
+	Token difference Nt of packed walks after t tokens.
+	: param walks (np.ndarray) : packed walks
+	: param t (int or np.ndarray) : time step of every walk
+	: return (np.ndarray) : Nt of every walk
+	'''
+	return 2 * popcount(walks & _MASKS[t]) - t
+
+def unpack_walks(walks, terminal):
+	'''
+	Expands packed walks to the token difference at every time step, like TokensEnv.trajectory.
+	: param walks (np.ndarray) : packed walks
+	: param terminal (int) : number of tokens per walk
+	: return (np.ndarray) : (num_walks, terminal+1) int64 array starting with 0
+	'''
+	walks = np.asarray(walks, dtype=np.uint64).reshape(-1)
+	bits = (walks[:, None] >> np.arange(terminal, dtype=np.uint64)) & np.uint64(1)
+	trajectory = np.zeros((len(walks), terminal + 1), dtype=np.int64)
+	np.cumsum(2 * bits.astype(np.int64) - 1, axis=1, out=trajectory[:, 1:])
+	return trajectory
+
+def pack_walks(trajectory):
+	'''
+	Inverse of unpack_walks.
+	: param trajectory (np.ndarray) : (num_walks, terminal+1) token differences starting with 0
+	: return (np.ndarray) : (num_walks,) uint64 packed walks
+	'''
+	trajectory = np.atleast_2d(trajectory)
+	check_terminal(trajectory.shape[1] - 1)
+	bits = (np.diff(trajectory, axis=1) > 0).astype(np.uint64)
+	return (bits << np.arange(trajectory.shape[1] - 1, dtype=np.uint64)).sum(axis=1, dtype=np.uint64)
@@ -0,0 +1,78 @@
+'''
+Buffered random numbers for the scalar hot loops of the envs and the lib policies.
+
+Drawing one number from a np.random.Generator costs a few microseconds of call
+overhead, while a block of thousands costs about the same. BufferedRNG draws the
+uniforms in blocks and hands them out one by one as python floats. Everything it
+draws comes from one Generator in a fixed order, so runs stay reproducible from
+their seed.
+'''
+import numpy as np
+
+class BufferedRNG:
+	'''
+	np.random.Generator with buffered scalar uniforms.
+	random() and choice() without a size take the next uniform of the block, the other
+	Generator methods (integers, binomial, ...) and sized draws go to the generator.
+	'''
+
+	def __init__(self, seed=None, block_size=4096):
+		'''
+		: param seed (int, np.random.SeedSequence or np.random.Generator): seed of the generator, a Generator is shared
+		: param block_size (int): number of uniforms drawn at once
+		'''
+		self.generator = np.random.default_rng(seed)
+		self.block_size = block_size
+		self._block = []
+		self._pos = 0
+
+	def __getattr__(self, name):
+		# only called for names BufferedRNG does not have, the guard keeps unpickling from recursing
+		if name == 'generator':
+			raise AttributeError(name)
+		return getattr(self.generator, name)
+
+	def _next(self):
+		if self._pos == len(self._block):
+			self._block = self.generator.random(self.block_size).tolist()
+			self._pos = 0
+		u = self._block[self._pos]
+		self._pos += 1
+		return u
+
+	def random(self, size=None):
+		'''
+		: return (float or np.ndarray) : uniform in [0, 1), an array of them if size is given
+		'''
+		if size is None:
+			return self._next()
+		return self.generator.random(size)
+
+	def choice(self, a, size=None, p=None):
+		'''
+		Generator.choice, a single draw (no size) takes one uniform of the block.
+		: return (int or element of a) : index drawn from range(a) if a is an int, else an element of a
+		'''
+		if size is not None:
+			return self.generator.choice(a, size=size, p=p)
+
+		is_range = isinstance(a, (int, np.integer))
+		n = a if is_range else len(a)
+		u = self._next()
+		if p is None:
+			index = int(u * n)
+		else:
+			index = 0
+			cumulative = p[0]
+			while u >= cumulative and index < n - 1:
+				index += 1
+				cumulative += p[index]
+		return index if is_range else a[index]
+
+def default_rng(seed=None):
+	'''
+	BufferedRNG of a seed, a BufferedRNG is returned as it is so it can be shared.
+	'''
+	if isinstance(seed, BufferedRNG):
+		return seed
+	return BufferedRNG(seed)
@@ -2,4 +2,14 @@ from .agent import *
 from .q_table import *
 from .weight import *
 from .policy import *
-from .scheduler import *
\ No newline at end of file
+from .scheduler import *
+from .solver import *
+from .evaluation import *
+from .multi_run import *
+
+def __getattr__(name):
+	# torch models are loaded on first use, see lib/networks.py
+	if name == 'PolicyNetwork':
+		from .networks import PolicyNetwork
+		return PolicyNetwork
+	raise AttributeError("module 'lib' has no attribute '{}'".format(name))
\ No newline at end of file
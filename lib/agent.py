@@ -5,6 +5,9 @@ import copy
 import numpy as np
 import random
 
+from gym_tokens.envs.model import ACTIONS
+from gym_tokens.rng import default_rng
+
 class BaseAgent:
 	"""
 	Abstract Agent interface
@@ -23,7 +26,54 @@ class BaseAgent:
 		
 		raise NotImplementedError
 
-class SarsaAgent:
+# true action of q_matrix column i, the inverse of q_table.ACTION_INDEX, as ints for the lookups of a single step
+TRUE_ACTIONS = tuple(ACTIONS.tolist())
+
+class _FusedStep:
+	"""
+	act and learn on state ids in one call per env step, for the tabular agents.
+	Subclasses give _scores (the values the policy sees) and _next_qVal (the bootstrap of the TD target).
+	"""
+	def act(self, state_id):
+		"""
+		Chooses the action of state_id, e.g. the first state of a game, step chooses the next ones
+		: return (int) : true action in [-1, 0, 1]
+		"""
+		self.action_index = self._choose(self.model.get_stateID(state_id))
+		return TRUE_ACTIONS[self.action_index]
+
+	def step(self, state_id, reward, next_state_id, done, lr, gamma=0.99, reward_type='discounted', ref_state_id=None, ref_action=0):
+		"""
+		Q_Table.get_TDerror and update_qVal of the last action chosen by act or step, then chooses the next action.
+		state_id and next_state_id are ids or states, see Q_Table.get_stateID
+		: return (tuple) : next true action (None once done) and TD error
+		"""
+		row = self.model.get_stateID(state_id)
+		next_row = None if done else self.model.get_stateID(next_state_id)
+		model, next_qVal, next_index = self._next_qVal(next_row)
+
+		current_qVal = model.q_matrix[row, self.action_index]
+		if reward_type == 'discounted':
+			td_error = reward + gamma*next_qVal - current_qVal
+		elif reward_type == 'average':
+			td_error = reward - model.avg_reward + next_qVal - current_qVal
+		else:
+			td_error = reward - model.q_matrix[model.get_stateID(ref_state_id), ref_action] + next_qVal - current_qVal
+		self.converged = model.update_entry(lr, row, self.action_index, td_error)
+
+		if done:
+			return None, td_error
+		# sarsa plays the action of its target, the others choose on the updated table
+		self.action_index = self._choose(next_row) if next_index is None else next_index
+		return TRUE_ACTIONS[self.action_index], td_error
+
+	def _choose(self, row):
+		return int(self.policy_type(self._scores(row))[0])
+
+	def _scores(self, row):
+		return self.model.q_matrix[row]
+
+class SarsaAgent(_FusedStep):
 	"""
 	Sarsa is an on-policy agent which updates the Q-values using latest experience
 	"""
@@ -41,15 +91,16 @@ class SarsaAgent:
 
 		return action_mapped
 
+	def _next_qVal(self, next_row):
+		if next_row is None:
+			return self.model, 0, None
+		next_index = self._choose(next_row)
+		return self.model, self.model.q_matrix[next_row, next_index], next_index
+
 	def _mapFromIndexToTrueActions(self, actions):
-		if actions == 1:
-			return -1 
-		elif actions == 2:
-			return 1
-		else:
-			return 0
+		return TRUE_ACTIONS[actions]
 
-class QlAgent:
+class QlAgent(_FusedStep):
 	"""
 	Q-learning is an off-policy agent which updates the Q-values using max over all possible actions
 	"""
@@ -66,14 +117,15 @@ class QlAgent:
 		action_mapped = self._mapFromIndexToTrueActions(actions)
 		return action_mapped
 
+	def _next_qVal(self, next_row):
+		if next_row is None:
+			return self.model, 0, None
+		return self.model, self.model.q_matrix[next_row].max(), None
+
 	def _mapFromIndexToTrueActions(self, actions):
-		if actions == 1:
-			return -1 
-		elif actions == 2:
-			return 1
-		else:
-			return 0
-class ExpectedSARSA:
+		return TRUE_ACTIONS[actions]
+
+class ExpectedSARSA(_FusedStep):
 	"""
 	Expected SARSA
 	"""
@@ -96,23 +148,30 @@ class ExpectedSARSA:
 				return 0
 			return action_mapped
 
+	def _next_qVal(self, next_row):
+		if next_row is None:
+			return self.model, 0, None
+		q_val = self.model.q_matrix[next_row]
+		return self.model, np.dot(q_val, self.policy_type.probs(q_val[None])[0]), None
+
 	def _mapFromIndexToTrueActions(self, actions):
-		if actions == 1:
-			return -1 
-		elif actions == 2:
-			return 1
-		else:
-			return 0		
+		return TRUE_ACTIONS[actions]
 
-class DoubleQLearning:
+class DoubleQLearning(_FusedStep):
 	"""
-	Double Q-Learning
+	Double Q-Learning, step updates model1 or model2 on a coin flip of rng
 	"""
-	def __init__(self, policy_type, model1 , model2, max_steps):
+	def __init__(self, policy_type, model1 , model2, max_steps, rng=None):
 		self.policy_type = policy_type
 		self.model1 = model1
 		self.model2 = model2
 		self.max_steps = max_steps
+		self.rng = default_rng(rng)
+
+	@property
+	def model(self):
+		# ids and rows are the same in both tables
+		return self.model1
 
 	def get_actions(self, states, get_probs=False, game_time_step=None, return_wait=False):
 		q_val = self.model1.get_qVal(states) + self.model2.get_qVal(states)
@@ -128,13 +187,18 @@ class DoubleQLearning:
 				return 0
 			return action_mapped
 
+	def _scores(self, row):
+		return self.model1.q_matrix[row] + self.model2.q_matrix[row]
+
+	def _next_qVal(self, next_row):
+		# the updated table picks the greedy action, the other one evaluates it
+		model, other = (self.model1, self.model2) if self.rng.random() < 0.5 else (self.model2, self.model1)
+		if next_row is None:
+			return model, 0, None
+		return model, other.q_matrix[next_row, np.argmax(model.q_matrix[next_row])], None
+
 	def _mapFromIndexToTrueActions(self, actions):
-		if actions == 1:
-			return -1 
-		elif actions == 2:
-			return 1
-		else:
-			return 0
+		return TRUE_ACTIONS[actions]
 
 class SemiSARSA:
 	"""
@@ -0,0 +1,111 @@
+"""
+Exact evaluation of a Q-table on the model of a tokens env (see gym_tokens.envs.model).
+Instead of sampling games, the probability mass of the initial state is pushed forward
+through the transitions taken with the policy's action probabilities, so the results
+have no variance.
+"""
+import numpy as np
+
+from gym_tokens.envs.model import ACTIONS, id_layout
+
+__all__ = ['evaluate_q_table', 'simulate_q_table']
+
+def evaluate_q_table(mdp, q_matrix, policy):
+	"""
+	Expected performance of acting with policy on q_matrix, a Q_Table.q_matrix of the same layout.
+	policy is a lib.policy object, only its probs method is used so every step is treated alike.
+	Returns a dict with:
+		accuracy: probability that a game ends with the correct side chosen
+		reward: expected reward per game
+		steps: expected number of steps per game
+		reward_rate: reward / steps, the average reward per step over many games
+		decision_time: distribution of |ht| at the end of a game, index 0 means no choice was made
+	"""
+	ids = mdp.state_ids
+	index = np.full(mdp.num_states, -1, dtype=np.int64)
+	index[ids] = np.arange(len(ids))
+
+	probs = policy.probs(q_matrix[ids])
+	states = mdp.decode(ids)
+	time_steps = states[:, 2]
+	# committing from a state with no choice yet sets |ht| = t+1
+	decision = np.where(states[:, 1:2] == 0, (time_steps[:, None] + 1) * (np.arange(mdp.num_actions) != 0), np.absolute(states[:, 1:2]))
+
+	# every transition moves the clock forward, so the mass is pushed one time step at a time
+	src = index[mdp.s]
+	order = np.argsort(time_steps[src], kind='stable')
+	src, actions, cols, prob = src[order], mdp.a[order], index[mdp.next_state[order]], mdp.prob[order]
+	bounds = np.searchsorted(time_steps[src], np.arange(mdp.terminal + 2))
+
+	R, done, correct = mdp.R[ids], mdp.done[ids], mdp.correct[ids]
+	mass = np.zeros(len(ids))
+	mass[index[mdp.initial_state]] = 1
+	flow_total = np.zeros((len(ids), mdp.num_actions))
+
+	for t in range(mdp.terminal + 1):
+		layer = time_steps == t
+		flow_total[layer] = mass[layer, None] * probs[layer]
+		k = slice(bounds[t], bounds[t+1])
+		mass += np.bincount(cols[k], weights=flow_total[src[k], actions[k]] * prob[k], minlength=len(ids))
+
+	ended = flow_total * done
+	reward = np.sum(flow_total * R)
+	steps = np.sum(flow_total)
+	decision_time = np.bincount(decision.reshape(-1), weights=ended.reshape(-1), minlength=mdp.terminal + 2)
+
+	return {
+		'accuracy': np.sum(flow_total * correct),
+		'reward': reward,
+		'steps': steps,
+		'reward_rate': reward / steps,
+		'decision_time': decision_time,
+	}
+
+def _state_ids(states, height):
+	"""
+	Q_Table.encode for a batch of (Nt, ht, t) or (Nt, ht) rows.
+	"""
+	strides, offset = id_layout(height, (2*height + 1, 2*height + 1, height)[:states.shape[1]])
+	return states @ np.array(strides) + offset
+
+def simulate_q_table(vec_env, q_matrix, policy, rng=None):
+	"""
+	Monte Carlo counterpart of evaluate_q_table that plays one game in every row of a
+	gym_tokens TokensVecEnv, so it also works for envs without an exact model.
+	Returns the same dict, estimated from vec_env.num_envs games.
+	"""
+	rng = np.random.default_rng(rng)
+	num_games = vec_env.num_envs
+	height = vec_env.terminal
+
+	reward = np.zeros(num_games)
+	steps = np.zeros(num_games)
+	correct = np.zeros(num_games, dtype=bool)
+	decision = np.zeros(num_games, dtype=np.int64)
+	active = np.ones(num_games, dtype=bool)
+	actions = np.zeros(num_games, dtype=np.int64)
+
+	states, _ = vec_env.reset()
+	while active.any():
+		# finished rows keep waiting, their next games are not counted
+		choice, _ = policy.sample(q_matrix[_state_ids(states[active], height)], uniforms=rng.random(np.count_nonzero(active)))
+		actions[:] = 0
+		actions[active] = ACTIONS[choice]
+
+		states, rewards, is_done, _ = vec_env.step(actions)
+		reward[active] += rewards[active]
+		steps[active] += 1
+
+		ended = np.flatnonzero(active & is_done)
+		ht = states[ended, 1]
+		decision[ended] = np.absolute(ht)
+		correct[ended] = (ht != 0) & (np.sign(vec_env.get_final_token_difference(ended)) == np.sign(ht))
+		active[ended] = False
+
+	return {
+		'accuracy': correct.mean(),
+		'reward': reward.mean(),
+		'steps': steps.mean(),
+		'reward_rate': reward.sum() / steps.sum(),
+		'decision_time': np.bincount(decision, minlength=height + 2) / num_games,
+	}
@@ -0,0 +1,180 @@
+"""
+Many independent tabular learners trained in lockstep on a gym_tokens vectorized env.
+Run r plays the games of row r and learns its own Q-table, so a whole grid of
+hyper-parameters is trained with one env step and one vectorized update per time step.
+"""
+import numpy as np
+
+from gym_tokens.envs.model import ACTIONS, id_layout
+
+from .policy import EpsilonGreedyPolicy, SoftmaxPolicy
+from .scheduler import Schedule, StackedSchedule
+
+__all__ = ['MultiRunQLearning']
+
+class MultiRunQLearning:
+	"""
+	R independent learners with their Q-tables in one (R, num_states, num_actions) tensor,
+	q_matrix[r] is laid out like the Q_Table.q_matrix of the same env.
+	algo ('sarsa', 'q-learning', 'e-sarsa', 'double-q') and reward_type ('discounted', 'average', 'rvi')
+	follow Q_Table.get_TDerror and exploration is 'epsilon' (EpsilonGreedyPolicy) or 'softmax' (SoftmaxPolicy).
+	These are shared by the runs, the other hyper-parameters are scalars or arrays of one entry per run:
+		gamma: discount factor of the 'discounted' TD error
+		lr_start, lr_final, lr_games: learning rate decayed by the games of the run, like LRscheduler
+		explore_start, explore_final, explore_frames: epsilon or temperature decayed by the steps, like the trackers
+	lr_schedule and explore_schedule replace the linear decays, a lib.Schedule shared by the runs or a list of one per run.
+	"""
+	def __init__(self, vec_env, algo='q-learning', exploration='epsilon', reward_type='discounted', gamma=0.99,
+			lr_start=0.1, lr_final=0.0001, lr_games=100000, explore_start=1.0, explore_final=0.01, explore_frames=40000,
+			avg_reward_step_size=0.99, lr_schedule=None, explore_schedule=None, rng=None):
+
+		if algo not in ('sarsa', 'q-learning', 'e-sarsa', 'double-q'):
+			raise ValueError('algo should be one of: sarsa, q-learning, e-sarsa, double-q')
+		if exploration not in ('epsilon', 'softmax'):
+			raise ValueError('exploration should be one of: epsilon, softmax')
+		if reward_type not in ('discounted', 'average', 'rvi'):
+			raise ValueError('reward_type should be one of: discounted, average, rvi')
+
+		self.env = vec_env
+		self.num_runs = vec_env.num_envs
+		self.algo = algo
+		self.exploration = exploration
+		self.reward_type = reward_type
+		self.avg_reward_step_size = avg_reward_step_size
+		self.rng = np.random.default_rng(rng)
+		# the runs' epsilons or temperatures are passed to the policy at every step
+		self.policy = SoftmaxPolicy(rng=self.rng) if exploration == 'softmax' else EpsilonGreedyPolicy(rng=self.rng)
+
+		runs = lambda x: np.broadcast_to(np.asarray(x, dtype=np.float64), (self.num_runs,)).copy()
+		self.gamma = runs(gamma)
+		self.lr_start, self.lr_final, self.lr_games = runs(lr_start), runs(lr_final), runs(lr_games)
+		self.explore_start, self.explore_final, self.explore_frames = runs(explore_start), runs(explore_final), runs(explore_frames)
+		# the linear decays of LRscheduler, EpsilonTracker and TemperatureTracker by default
+		if lr_schedule is None:
+			lr_schedule = [Schedule.linear(*run) for run in zip(self.lr_start, self.lr_final, self.lr_games)]
+		if explore_schedule is None:
+			explore_schedule = [Schedule.linear(*run) for run in zip(self.explore_start, self.explore_final, self.explore_frames)]
+		self.lr_schedule = StackedSchedule(lr_schedule) if isinstance(lr_schedule, (list, tuple)) else lr_schedule
+		self.explore_schedule = StackedSchedule(explore_schedule) if isinstance(explore_schedule, (list, tuple)) else explore_schedule
+
+		height = vec_env.terminal
+		num_states = vec_env.get_num_states()
+		num_actions = vec_env.get_num_actions()
+		# ids of Q_Table.encode for (Nt, ht, t) or (Nt, ht) observations
+		strides, self.offset = id_layout(height, (2*height + 1, 2*height + 1, height)[:vec_env.observation_space.shape[0]])
+		self.strides = np.array(strides)
+
+		self.q_matrix = np.zeros((self.num_runs, num_states, num_actions))
+		self.q_matrix2 = np.zeros_like(self.q_matrix) if algo == 'double-q' else None
+		self.avg_reward = np.zeros(self.num_runs)
+
+		self.num_frames = np.zeros(self.num_runs, dtype=np.int64)
+		self.num_games = np.zeros(self.num_runs, dtype=np.int64)
+		# runs stop learning and counting once they are set inactive, their games keep going
+		self.active = np.ones(self.num_runs, dtype=bool)
+
+		self._runs = np.arange(self.num_runs)
+		self._initial_id = self.offset
+		self.reset()
+
+	def reset(self):
+		states, _ = self.env.reset()
+		self.state_ids = self.get_state_ids(states)
+		self._action_index = np.zeros(self.num_runs, dtype=np.int64)
+		# sarsa plays the next action its TD target used, other rows draw a new one
+		self._pending = np.ones(self.num_runs, dtype=bool)
+
+	def get_state_ids(self, states):
+		return states @ self.strides + self.offset
+
+	def get_exploration(self):
+		"""
+		Epsilon or temperature of every run at its current step
+		"""
+		return self.explore_schedule(self.num_frames)
+
+	def get_lr(self):
+		return self.lr_schedule(self.num_games)
+
+	def _scores(self, runs, ids):
+		if self.algo == 'double-q':
+			return self.q_matrix[runs, ids] + self.q_matrix2[runs, ids]
+		return self.q_matrix[runs, ids]
+
+	def step(self):
+		"""
+		Plays one step in every run and applies the TD updates of the active runs.
+		: return (tuple) : rewards, is_done mask and next states of the step, see TokensVecEnv.step
+		"""
+		exploration = self.get_exploration()
+		# uniforms of the actions, the next actions of sarsa and the coin flips of double-q
+		self._uniforms = self.rng.random((3, self.num_runs))
+		pending = np.flatnonzero(self._pending)
+		if len(pending):
+			self._action_index[pending] = self.policy.sample(self._scores(pending, self.state_ids[pending]), exploration[pending], self._uniforms[0, pending])[0]
+
+		next_states, rewards, is_done, _ = self.env.step(ACTIONS[self._action_index])
+
+		lr = self.get_lr() * self.active
+		live = np.flatnonzero(~is_done)
+		next_ids = self.get_state_ids(next_states[live])
+
+		if self.algo == 'double-q':
+			# every run updates one of its two tables, the other one evaluates the greedy action
+			first = self._uniforms[2] < 0.5
+			self._update(self.q_matrix, self.q_matrix2, first, rewards, live, next_ids, lr, exploration)
+			self._update(self.q_matrix2, self.q_matrix, ~first, rewards, live, next_ids, lr, exploration)
+		else:
+			self._update(self.q_matrix, None, np.ones(self.num_runs, dtype=bool), rewards, live, next_ids, lr, exploration)
+
+		self._pending[:] = True
+		if self.algo == 'sarsa':
+			self._pending[live] = False
+
+		self.num_frames += self.active
+		self.num_games += self.active & is_done
+		# finished games restart from the initial state, all zeros
+		self.state_ids[live] = next_ids
+		self.state_ids[is_done] = self._initial_id
+
+		return rewards, is_done, next_states
+
+	def _update(self, q_matrix, q_matrix2, updated, rewards, live, next_ids, lr, exploration):
+		"""
+		Vectorized Q_Table.get_TDerror and update_qVal for the runs in the updated mask.
+		"""
+		ids = self.state_ids
+		current = q_matrix[self._runs, ids, self._action_index]
+
+		next_qVal = np.zeros(self.num_runs)
+		next_rows = q_matrix[live, next_ids]
+		if self.algo == 'sarsa':
+			next_index = self.policy.sample(next_rows, exploration[live], self._uniforms[1, live])[0]
+			next_qVal[live] = next_rows[np.arange(len(live)), next_index]
+		elif self.algo == 'q-learning':
+			next_qVal[live] = next_rows.max(axis=1)
+		elif self.algo == 'e-sarsa':
+			next_qVal[live] = np.sum(next_rows * self.policy.probs(next_rows, exploration[live]), axis=1)
+		else:
+			next_qVal[live] = q_matrix2[live, next_ids, np.argmax(next_rows, axis=1)]
+
+		if self.reward_type == 'discounted':
+			td_errors = rewards + self.gamma * next_qVal - current
+		elif self.reward_type == 'average':
+			td_errors = rewards - self.avg_reward + next_qVal - current
+		else:
+			# reference of Q_Table.get_TDerror in main.py: initial state, wait action
+			td_errors = rewards - q_matrix[self._runs, self._initial_id, 0] + next_qVal - current
+
+		td_errors = td_errors * updated
+		q_matrix[self._runs, ids, self._action_index] += lr * td_errors
+		if self.reward_type == 'average':
+			self.avg_reward += td_errors * self.avg_reward_step_size * lr
+		if self.algo == 'sarsa':
+			self._action_index[live] = next_index
+
+	def save_q_state(self, file, run, timestep):
+		"""
+		Saves the Q-table of one run like Q_Table.save_q_state
+		"""
+		np.save(file+'/q_mat_'+str(timestep), self.q_matrix[run])
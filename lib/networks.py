@@ -0,0 +1,19 @@
+"""
+Torch models, imported on first use of lib.PolicyNetwork so tabular runs do not load torch.
+"""
+import torch.nn as nn
+
+class PolicyNetwork(nn.Module):
+  def __init__(self, in_dim, h_dim, out_dim):
+    super(PolicyNetwork, self).__init__()
+    self.linear_1 = nn.Linear(in_dim, h_dim, bias=True)
+    self.relu_1 = nn.ReLU()
+    self.linear_2 = nn.Linear(h_dim, out_dim, bias=True)
+    self.softmax = nn.Softmax(dim=1)
+
+  def forward(self, input):
+    o_1 = self.linear_1(input)
+    o_2 = self.relu_1(o_1)
+    o_3 = self.linear_2(o_2)
+    o_4 = self.softmax(o_3)
+    return o_4
\ No newline at end of file
@@ -1,51 +1,101 @@
 import numpy as np
-from scipy.special import softmax
-import torch
-import torch.nn as nn
+
+from gym_tokens.rng import default_rng
+
+from .scheduler import make_schedule
+
+def softmax(x, axis=None):
+	"""
+	scipy.special.softmax, without importing scipy
+	"""
+	exp = np.exp(x - np.max(x, axis=axis, keepdims=True))
+	return exp / np.sum(exp, axis=axis, keepdims=True)
+
+def inverse_cdf(probs, uniforms):
+	"""
+	Action index of every row of probs, drawn with one uniform in [0, 1) per row
+	"""
+	cdf = np.cumsum(probs, axis=1)
+	return np.sum(uniforms[:, None] * cdf[:, -1:] >= cdf[:, :-1], axis=1)
+
+def _per_row(value, default):
+	# a scalar or one value per row, as a column that broadcasts against (N, num_actions)
+	return np.asarray(default if value is None else value, dtype=np.float64)[..., None]
 
 class Policy:
 	"""
-	Abstract class that converts Q-values to actions
+	Abstract class that converts Q-values to actions.
+	Each policy draws from its own gym_tokens.rng.BufferedRNG, built from the rng argument
+	(a seed, a SeedSequence, a Generator or a BufferedRNG to share).
 	"""
 
 	def __call__(self, scores):
 		raise NotImplementedError
 
+	def probs(self, scores, param=None):
+		"""
+		Probabilities of every action for a batch of Q-values, both (N, num_actions).
+		param is the epsilon or temperature of every row, the policy's own by default.
+		"""
+		raise NotImplementedError
+
+	def sample(self, scores, param=None, uniforms=None):
+		"""
+		Batched __call__: action indices and probabilities for (N, num_actions) Q-values.
+		Actions are drawn by inverse CDF from uniforms, one per row, taken from self.rng if not given.
+		"""
+		probs = self.probs(scores, param)
+		if uniforms is None:
+			uniforms = self.rng.random(len(probs))
+		return inverse_cdf(probs, uniforms), probs
+
 class GreedyPolicy(Policy):
 	"""
 	Select actions that maximizes the Q-values
 	"""
 
+	def __init__(self, rng=None):
+		self.rng = default_rng(rng)
+
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 		if np.all(scores == scores[0]):
-			return np.random.choice(len(scores))
+			return self.rng.choice(len(scores))
 		else:
 			return np.argmax(scores, axis=0)
 
+	def probs(self, scores, param=None):
+		# ties are only broken at random when all scores are equal, like __call__
+		probs = np.zeros(scores.shape)
+		probs[np.arange(len(scores)), np.argmax(scores, axis=1)] = 1
+		ties = np.all(scores == scores[:, :1], axis=1)
+		probs[ties] = 1.0 / scores.shape[1]
+		return probs
+
 class EpsilonGreedyPolicy(Policy):
 	"""
 	Select random actions with prob <= epsilon, else select greedy actions
 	"""
 
-	def __init__(self, epsilon=0.01, default_policy=GreedyPolicy()):
+	def __init__(self, epsilon=0.01, default_policy=None, rng=None):
 		self.epsilon = epsilon
-		self.default_policy = default_policy
+		self.rng = default_rng(rng)
+		self.default_policy = default_policy if default_policy is not None else GreedyPolicy(self.rng)
 
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 
 		num_actions = len(scores)
-		eps_mask = np.random.random(size=1) < self.epsilon
-		actions = self.default_policy(scores)
-		rand_actions = np.random.choice(num_actions, size=sum(eps_mask))
-		
-		if eps_mask:
-
-			return rand_actions, None
+		# the greedy action is only computed when the policy does not explore
+		if self.rng.random() < self.epsilon:
+			return self.rng.choice(num_actions), None
 
 		else:
-			return actions, None
+			return self.default_policy(scores), None
+
+	def probs(self, scores, epsilon=None):
+		epsilon = _per_row(epsilon, self.epsilon)
+		return epsilon / scores.shape[1] + (1 - epsilon) * self.default_policy.probs(scores)
 
 
 class EpsilonGreedyBiasedPolicy(Policy):
@@ -53,49 +103,51 @@ class EpsilonGreedyBiasedPolicy(Policy):
 	Select random actions with prob <= epsilon, else select greedy actions
 	"""
 
-	def __init__(self, epsilon=0.01, default_policy=GreedyPolicy()):
+	def __init__(self, epsilon=0.01, default_policy=None, rng=None):
 		self.epsilon = epsilon
-		self.default_policy = default_policy
+		self.rng = default_rng(rng)
+		self.default_policy = default_policy if default_policy is not None else GreedyPolicy(self.rng)
 
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 		num_actions = len(scores)
-		eps_mask = np.random.random(size=1) < self.epsilon
-		actions = self.default_policy(scores)
-
-		prob_wait_action = 1/3 + self.epsilon
-		prob_left_right_action = 1/3-(self.epsilon/2)
-		rand_actions = np.random.choice(num_actions, size=sum(eps_mask), p=[prob_wait_action, prob_left_right_action, prob_left_right_action])
-
-		if eps_mask:
-			return rand_actions, None
+		if self.rng.random() < self.epsilon:
+			prob_wait_action = 1/3 + self.epsilon
+			prob_left_right_action = 1/3-(self.epsilon/2)
+			return self.rng.choice(num_actions, p=[prob_wait_action, prob_left_right_action, prob_left_right_action]), None
 
 		else:
-			return actions, None
+			return self.default_policy(scores), None
+
+	def probs(self, scores, epsilon=None):
+		epsilon = _per_row(epsilon, self.epsilon)
+		random_probs = np.concatenate(np.broadcast_arrays(1/3 + epsilon, 1/3 - (epsilon/2), 1/3 - (epsilon/2)), axis=-1)
+		return epsilon * random_probs + (1 - epsilon) * self.default_policy.probs(scores)
 
 class EpsilonGreedyGamePolicy(Policy):
 	"""
 	Select random actions with prob <= epsilon, else select greedy actions
 	"""
 
-	def __init__(self, epsilon=0.01, default_policy=GreedyPolicy()):
+	def __init__(self, epsilon=0.01, default_policy=None, rng=None):
 		self.epsilon = epsilon
-		self.default_policy = default_policy
+		self.rng = default_rng(rng)
+		self.default_policy = default_policy if default_policy is not None else GreedyPolicy(self.rng)
 
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 		num_actions = len(scores)
-		eps_mask = np.random.random(size=1) < self.epsilon
-		actions = self.default_policy(scores)
-
-		prob_left_right_action = (1-self.epsilon)/2
-		rand_actions = np.random.choice(num_actions, size=sum(eps_mask), p=[self.epsilon, prob_left_right_action, prob_left_right_action])
-
-		if eps_mask:
-			return rand_actions, None
+		if self.rng.random() < self.epsilon:
+			prob_left_right_action = (1-self.epsilon)/2
+			return self.rng.choice(num_actions, p=[self.epsilon, prob_left_right_action, prob_left_right_action]), None
 
 		else:
-			return actions, None
+			return self.default_policy(scores), None
+
+	def probs(self, scores, epsilon=None):
+		epsilon = _per_row(epsilon, self.epsilon)
+		random_probs = np.concatenate(np.broadcast_arrays(epsilon, (1-epsilon)/2, (1-epsilon)/2), axis=-1)
+		return epsilon * random_probs + (1 - epsilon) * self.default_policy.probs(scores)
 
 class EpsilonGreedyGameDecisionPolicy(Policy):
 	"""
@@ -104,95 +156,90 @@ class EpsilonGreedyGameDecisionPolicy(Policy):
 
 	"""
 
-	def __init__(self, epsilon=0.01, default_policy=GreedyPolicy()):
+	def __init__(self, epsilon=0.01, default_policy=None, rng=None):
 		self.epsilon = epsilon
-		self.default_policy = default_policy
+		self.rng = default_rng(rng)
+		self.default_policy = default_policy if default_policy is not None else GreedyPolicy(self.rng)
 
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 		num_actions = len(scores)
-		eps_mask = np.random.random(size=1) < self.epsilon
-		actions = self.default_policy(scores)
-
-		prob_left_right_action = (1-self.epsilon)/2
-		rand_actions = np.random.choice(num_actions, size=sum(eps_mask), p=[self.epsilon, prob_left_right_action, prob_left_right_action])
-
-
-		if eps_mask:
-			return rand_actions, None
+		if self.rng.random() < self.epsilon:
+			prob_left_right_action = (1-self.epsilon)/2
+			return self.rng.choice(num_actions, p=[self.epsilon, prob_left_right_action, prob_left_right_action]), None
 
 		else:
-			return actions, None
+			return self.default_policy(scores), None
+
+	def probs(self, scores, epsilon=None):
+		epsilon = _per_row(epsilon, self.epsilon)
+		random_probs = np.concatenate(np.broadcast_arrays(epsilon, (1-epsilon)/2, (1-epsilon)/2), axis=-1)
+		return epsilon * random_probs + (1 - epsilon) * self.default_policy.probs(scores)
 
 class SoftmaxPolicy(Policy):
 	"""
 	Choose actions according to their softmax probabilty
 	"""
 
-	def __init__(self, temperature = 1):
+	def __init__(self, temperature = 1, rng=None):
 		self.temperature: float = temperature
+		self.rng = default_rng(rng)
 
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 		num_actions = len(scores)
 		probs = softmax(scores/self.temperature)
-		action = np.random.choice(num_actions, p = probs)
+		action = self.rng.choice(num_actions, p = probs)
 		return action, probs
 
+	def probs(self, scores, temperature=None):
+		return softmax(scores/_per_row(temperature, self.temperature), axis=1)
+
 class EpsilonSoftPolicy(Policy):
 	"""
 	Choose actions according to their softmax probabilty
 	"""
 
-	def __init__(self, epsilon = 0.01):
+	def __init__(self, epsilon = 0.01, rng=None):
 		self.epsilon = epsilon
+		self.rng = default_rng(rng)
 
 	def __call__(self, scores):
 		assert isinstance(scores, np.ndarray)
 		num_actions = len(scores)
 		probs = [self.epsilon/float(num_actions)]*num_actions
 		probs[np.argmax(scores)] += 1 - self.epsilon
-		action = np.random.choice(num_actions, p = probs)
+		action = self.rng.choice(num_actions, p = probs)
 		return action, probs
 
+	def probs(self, scores, epsilon=None):
+		epsilon = _per_row(epsilon, self.epsilon)
+		greedy = np.zeros(scores.shape)
+		greedy[np.arange(len(scores)), np.argmax(scores, axis=1)] = 1
+		return epsilon/float(scores.shape[1]) + (1 - epsilon) * greedy
+
 
 class EpsilonTracker():
 
-	def __init__(self, eps_start, eps_final, num_frames, policy):
+	def __init__(self, eps_start, eps_final, num_frames, policy, kind='linear'):
 		self.eps_start = eps_start
 		self.eps_final = eps_final
 		self.num_frames = num_frames
 		self.policy = policy
+		self.schedule = make_schedule(kind, eps_start, eps_final, num_frames)
 
 	def set_eps(self, frame):
-		eps = self.eps_start - frame/float(self.num_frames)
-		self.policy.epsilon =  max(eps, self.eps_final)
+		self.policy.epsilon = self.schedule(frame)
 
 
 class TemperatureTracker():
 
-	def __init__(self, tmp_start, tmp_final, num_frames, policy):
+	def __init__(self, tmp_start, tmp_final, num_frames, policy, kind='linear'):
 		self.tmp_start = tmp_start
 		self.tmp_final = tmp_final
 		self.num_frames = num_frames
 		self.policy = policy
+		self.schedule = make_schedule(kind, tmp_start, tmp_final, num_frames)
 
 	def set_tmp(self, frame):
-		tmp = self.tmp_start - frame/float(self.num_frames)
-		self.policy.temperature =  max(tmp, self.tmp_final)
-
-
-class PolicyNetwork(nn.Module):
-  def __init__(self, in_dim, h_dim, out_dim):
-    super(PolicyNetwork, self).__init__()
-    self.linear_1 = nn.Linear(in_dim, h_dim, bias=True)
-    self.relu_1 = nn.ReLU()
-    self.linear_2 = nn.Linear(h_dim, out_dim, bias=True)
-    self.softmax = nn.Softmax(dim=1)
-
-  def forward(self, input):
-    o_1 = self.linear_1(input)
-    o_2 = self.relu_1(o_1)
-    o_3 = self.linear_2(o_2)
-    o_4 = self.softmax(o_3)
-    return o_4
\ No newline at end of file
+		self.policy.temperature = self.schedule(frame)
@@ -1,13 +1,92 @@
 import numpy as np
 
+from gym_tokens.envs.model import id_layout
+
+# index of the true actions -1, 0 and 1 in the q_matrix columns, looked up with actions + 1
+ACTION_INDEX = np.array([1, 0, 2])
+
 class Q_Table:
 
-	def __init__(self, num_states, num_actions, shape, converge_val, height, initial_avg_reward = 0): 
+	def __init__(self, num_states, num_actions, shape, converge_val, height, initial_avg_reward = 0, exact_convergence = False, delta_decay = 0.99, storage = 'dense', dtype = np.float64): 
 		self.shape = shape
-		self.q_matrix = np.zeros((num_states, num_actions))
+		self.num_states = num_states
+		self.storage = storage
 		self.converge_val = converge_val
 		self.height = height
 		self.avg_reward = initial_avg_reward
+		# exact_convergence compares copies of the whole table like the original update_qVal did
+		self.exact_convergence = exact_convergence
+		self.delta_decay = delta_decay
+		self.last_delta = 0.0
+		self.max_delta = 0.0
+		self.delta_ema = 0.0
+		self.reset_convergence_window()
+
+		# state id = states . strides + offset, see gym_tokens.envs.model.id_layout
+		strides, self.offset = id_layout(height, shape)
+		self.strides = np.array(strides)
+		self._stride_Nt, self._stride_ht = strides[0], strides[1]
+
+		if storage == 'dense':
+			self._rows = None
+			self.q_matrix = np.zeros((num_states, num_actions), dtype=dtype)
+		elif storage == 'reachable':
+			self._init_reachable_rows()
+			self.q_matrix = np.zeros((len(self.reachable_ids) + 1, num_actions), dtype=dtype)
+		else:
+			raise ValueError('storage should be one of: dense, reachable')
+
+	def _init_reachable_rows(self):
+		"""
+		Gives a q_matrix row to every state a game can reach: |Nt| <= t with the parity of t, and
+		ht = 0 or |ht| <= t+1 (a choice made at time t is stored as (t+1) * action).
+		Rows are looked up from the dense state id, so both layouts share the same ids. Ids of
+		unreachable states, including the ones off the dense table, go to one extra sink row.
+		"""
+		if len(self.shape) != 3:
+			raise ValueError('reachable storage needs a (Nt, ht, t) table')
+
+		timestep = self.shape[2]
+		states = []
+		for t in range(timestep + 1):
+			max_ht = min(t + 1, self.height + 1)
+			Nt, ht = np.meshgrid(np.arange(-t, t + 1, 2), np.arange(-max_ht, max_ht + 1), indexing='ij')
+			states.append(np.stack([Nt.ravel(), ht.ravel(), np.full(Nt.size, t)], axis=1))
+		states = np.concatenate(states)
+		states = states[np.absolute(states[:, 0]) <= self.height]
+
+		# ids of |ht| = height+1 spill over into the neighbouring rows, and negative ones wrap
+		# around to the end of the table, like they do in the dense layout
+		ids = self.encode(states)
+		self.reachable_ids = np.unique(np.where(ids < 0, ids + self.num_states, ids))
+		self._pad = timestep + 1
+		num_ids = self.num_states + 2 * self._pad
+		num_rows = len(self.reachable_ids) + 1
+		self._rows = np.full(num_ids, num_rows - 1, dtype=np.uint16 if num_rows <= np.iinfo(np.uint16).max else np.int32)
+		self._rows[self.reachable_ids + self._pad] = np.arange(num_rows - 1)
+		self._rows[:self._pad] = self._rows[self.num_states:self.num_states + self._pad]
+
+	def get_dense_q_matrix(self):
+		"""
+		The q_matrix in the dense layout, the one saved by save_q_state
+		"""
+		if self._rows is None:
+			return self.q_matrix
+		dense = np.zeros((self.num_states, self.q_matrix.shape[1]), dtype=self.q_matrix.dtype)
+		on_table = (self.reachable_ids >= 0) & (self.reachable_ids < self.num_states)
+		dense[self.reachable_ids[on_table]] = self.q_matrix[self._rows[self.reachable_ids[on_table] + self._pad]]
+		return dense
+
+	def set_dense_q_matrix(self, q_matrix):
+		"""
+		Loads a q_matrix in the dense layout, e.g. a saved q_mat or a lib.solve warm start
+		"""
+		if self._rows is None:
+			self.q_matrix = np.array(q_matrix, dtype=self.q_matrix.dtype)
+			return
+		on_table = (self.reachable_ids >= 0) & (self.reachable_ids < self.num_states)
+		self.q_matrix[:] = 0
+		self.q_matrix[self._rows[self.reachable_ids[on_table] + self._pad]] = q_matrix[self.reachable_ids[on_table]]
 
 	def get_qVal(self, states):
 		statesID = self.get_stateID(states)
@@ -19,16 +98,47 @@ class Q_Table:
 
 	def update_qVal(self, learning_rate, states, actions, td_error):
 
-		temp = self.q_matrix.copy()
-
 		statesID = self.get_stateID(states)
 		currentActionsIndex = self._mapFromTrueActionsToIndex(actions)
-		self.q_matrix[statesID, currentActionsIndex] += learning_rate * td_error
+		return self.update_entry(learning_rate, statesID, currentActionsIndex, td_error)
 
-		if self._hasConverged(temp, self.q_matrix):
-			return True
-		else:
-			return False
+	def update_entry(self, learning_rate, stateID, action_index, td_error):
+		"""
+		update_qVal for a q_matrix row (from get_stateID) and column (see ACTION_INDEX)
+		"""
+		if self.exact_convergence:
+			temp = self.q_matrix.copy()
+			self.q_matrix[stateID, action_index] += learning_rate * td_error
+			self._track_delta(abs(self.q_matrix[stateID, action_index] - temp[stateID, action_index]))
+			return self._hasConverged(temp, self.q_matrix)
+
+		# only one entry changes, so the norm of the change is the change of that entry
+		old_qVal = self.q_matrix[stateID, action_index]
+		self.q_matrix[stateID, action_index] += learning_rate * td_error
+		delta = abs(self.q_matrix[stateID, action_index] - old_qVal)
+		self._track_delta(delta)
+
+		return delta < self.converge_val
+
+	def _track_delta(self, delta):
+		self.last_delta = delta
+		self.max_delta = max(self.max_delta, delta)
+		self.delta_ema = self.delta_decay * self.delta_ema + (1 - self.delta_decay) * delta
+		self.window_sq_sum += delta * delta
+		self.window_updates += 1
+
+	def reset_convergence_window(self):
+		"""
+		Starts a new window of changes for get_window_norm, e.g. once per game or per save interval
+		"""
+		self.window_sq_sum = 0.0
+		self.window_updates = 0
+
+	def get_window_norm(self):
+		"""
+		Norm of all the changes made since reset_convergence_window, as if they were applied at once to distinct entries
+		"""
+		return np.sqrt(self.window_sq_sum)
 
 
 	def _hasConverged(self, q_mat1, q_mat2):
@@ -41,27 +151,47 @@ class Q_Table:
 			return False
 
 
-	def get_stateID(self,states):
-
-		assert isinstance(states, np.ndarray)
+	def get_stateID(self, states):
+		"""
+		Id of a state, integer ids (e.g. from an env with obs_type='id') are returned as they are
+		"""
+		ids = states if isinstance(states, (int, np.integer)) else self.encode(states)
+		if self._rows is None:
+			return ids
+		return self._rows[ids + self._pad]
 
-		ids = []
+	def encode(self, states):
+		"""
+		Ids of a single state or of every row of an (N, state_dim) array
+		"""
+		if isinstance(states, np.ndarray):
+			if states.ndim > 1:
+				return states @ self.strides + self.offset
+			states = states.tolist()
+		# plain ints are much faster than numpy for a single state
+		if len(self.strides) == 3:
+			return states[0] * self._stride_Nt + states[1] * self._stride_ht + states[2] + self.offset
+		return states[0] * self._stride_Nt + states[1] + self.offset
 
+	def decode(self, ids):
+		"""
+		Inverse of encode, a single state or an (N, state_dim) array of states
+		"""
+		ids = np.asarray(ids)
+		num_cols = self.shape[1]
 		if len(self.shape) == 3:
-			num_rows, num_cols, timestep = self.shape
+			ids, t = np.divmod(ids, self.shape[2] + 1)
+			Nt, ht = np.divmod(ids, num_cols)
+			return np.stack([Nt - self.height, ht - self.height, t], axis=-1)
+		Nt, ht = np.divmod(ids, num_cols)
+		return np.stack([Nt - self.height, ht - self.height], axis=-1)
 
-			Nt = self._augState(states[0])
-			ht = self._augState(states[1])
-			temp_id = Nt * num_cols + ht
-			temp_id_time = temp_id*(timestep+1) + states[2]
-		else:
-			num_rows, num_cols = self.shape
-			Nt = self._augState(states[0])
-			ht = self._augState(states[1])
-			temp_id = Nt * num_cols + ht
-			temp_id_time = temp_id
-			
-		return temp_id_time
+	def _get_batch_stateIDs(self, states):
+		states = np.asarray(states)
+		ids = states if states.ndim == 1 else self.encode(states)
+		if self._rows is None:
+			return ids
+		return self._rows[ids + self._pad]
 
 	def get_TDerror(self, states, actions, next_states, next_actions, reward, gamma, is_done, algo, model2 = None, ref_state = None, ref_action = None, reward_type = 'discounted'):
 		statesID = self.get_stateID(states)
@@ -99,11 +229,76 @@ class Q_Table:
 		else:
 			return None
 
+	def update_qVal_batch(self, learning_rate, states, actions, td_errors):
+		"""
+		Applies the TD errors of a batch of transitions at once, see get_TDerror_batch.
+		Repeated state-action pairs add up their updates. learning_rate is a float or one per transition.
+		"""
+		statesID = self._get_batch_stateIDs(states)
+		currentActionsIndex = ACTION_INDEX[np.asarray(actions) + 1]
+
+		if self.exact_convergence:
+			temp = self.q_matrix.copy()
+			np.add.at(self.q_matrix, (statesID, currentActionsIndex), learning_rate * td_errors)
+			self._track_delta(np.linalg.norm(self.q_matrix - temp))
+			return self._hasConverged(temp, self.q_matrix)
+
+		entries, inverse = np.unique(statesID * self.q_matrix.shape[1] + currentActionsIndex, return_inverse=True)
+		changes = np.bincount(inverse.reshape(-1), weights=np.broadcast_to(learning_rate * td_errors, inverse.shape))
+		q_flat = self.q_matrix.reshape(-1)
+		old_qVals = q_flat[entries]
+		q_flat[entries] += changes
+		delta = np.linalg.norm(q_flat[entries] - old_qVals)
+		self._track_delta(delta)
+
+		return delta < self.converge_val
+
+	def get_TDerror_batch(self, states, actions, next_states, next_actions, rewards, gamma, is_done, algo, model2 = None, ref_state = None, ref_action = None, reward_type = 'discounted'):
+		"""
+		Vectorized get_TDerror over a batch of N transitions.
+		states and next_states are (N, state_dim) arrays or (N,) state ids, actions, rewards and is_done have one entry per transition.
+		next_actions holds true actions for 'sarsa' and (N, num_actions) action probabilities for 'e-sarsa'.
+		"""
+		is_done = np.asarray(is_done, dtype=bool)
+		statesID = self._get_batch_stateIDs(states)
+		currentActionsIndex = ACTION_INDEX[np.asarray(actions) + 1]
+		current_qVal = self.q_matrix[statesID, currentActionsIndex]
+
+		# finished transitions keep a next value of 0, their next state may even be off the table
+		next_qVal = np.zeros(len(statesID))
+		live = ~is_done
+		if np.any(live):
+			next_statesID = self._get_batch_stateIDs(np.asarray(next_states)[live])
+			next_rows = self.q_matrix[next_statesID, :]
+
+			if algo == 'sarsa':
+				nextActionsIndex = ACTION_INDEX[np.asarray(next_actions)[live] + 1]
+				next_qVal[live] = next_rows[np.arange(len(next_rows)), nextActionsIndex]
+
+			elif algo == 'q-learning':
+				next_qVal[live] = np.max(next_rows, axis=1)
+
+			elif algo == 'e-sarsa':
+				next_qVal[live] = np.sum(next_rows * np.asarray(next_actions)[live], axis=1)
+
+			elif algo == 'double-q':
+				next_qVal[live] = model2.q_matrix[next_statesID, np.argmax(next_rows, axis=1)]
+
+		if reward_type == 'discounted':
+			return rewards + (gamma*next_qVal) - current_qVal
+		elif reward_type == 'average':
+			return rewards - self.avg_reward + next_qVal - current_qVal
+		elif reward_type == "rvi":
+			q_ref = self.get_qVal(states=ref_state)[ref_action]
+			return rewards - q_ref + next_qVal - current_qVal
+		else:
+			return None
+
 	def set_avg_reward(self, new_error, step_size, learning_rate):
 		self.avg_reward += new_error*step_size*learning_rate
 
 	def save_q_state(self, file, timestep):
-		np.save(file+'/q_mat_'+str(timestep), self.q_matrix)
+		np.save(file+'/q_mat_'+str(timestep), self.get_dense_q_matrix())
 
 	def _augState(self, stateVal):
 		"""
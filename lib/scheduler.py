@@ -1,10 +1,95 @@
+import numpy as np
+
+class Schedule():
+	"""
+	Values of a hyper-parameter over frames or games, computed once for indices 0..len-1.
+	Indices past the end keep the last value, so a schedule only stores its decay.
+	schedule(index) takes an int or an array of indices, e.g. the frames of the runs of a batched engine.
+	"""
+
+	def __init__(self, values):
+		self.values = np.asarray(values, dtype=np.float64)
+		self._list = self.values.tolist()
+		self._last = len(self._list) - 1
+
+	def __len__(self):
+		return len(self._list)
+
+	def __call__(self, index):
+		if isinstance(index, (int, np.integer)):
+			return self._list[index if index < self._last else self._last]
+		return self.values[np.minimum(index, self._last)]
+
+	@classmethod
+	def linear(cls, start, final, num_frames):
+		# start - frame/num_frames like the old trackers, it reaches final after (start - final) * num_frames frames
+		if num_frames <= 0:
+			return cls([final])
+		length = max(int(np.ceil((start - final) * num_frames)), 0) + 2
+		return cls(np.maximum(start - np.arange(length)/float(num_frames), final))
+
+	@classmethod
+	def exponential(cls, start, final, num_frames):
+		# geometric decay from start to final over num_frames
+		if num_frames <= 0:
+			return cls([final])
+		frames = np.arange(num_frames + 1)
+		return cls(start * (final / start) ** (frames / float(num_frames)))
+
+	@classmethod
+	def inverse_time(cls, start, final, num_frames):
+		# start / (1 + k * frame), k chosen so the value is final at num_frames
+		if num_frames <= 0:
+			return cls([final])
+		frames = np.arange(num_frames + 1)
+		return cls(start / (1 + (start / final - 1) * frames / float(num_frames)))
+
+	@classmethod
+	def piecewise(cls, points):
+		# linear interpolation between (frame, value) points, constant before the first and after the last
+		frames, values = zip(*sorted(points))
+		return cls(np.interp(np.arange(frames[-1] + 1), frames, values))
+
+class StackedSchedule():
+	"""
+	One Schedule per run of a batched engine, called with an array of the runs' frame or game indices.
+	Runs with the same values share one row of the table.
+	"""
+
+	def __init__(self, schedules):
+		rows = {}
+		self.rows = np.array([rows.setdefault(schedule.values.tobytes(), len(rows)) for schedule in schedules])
+		unique = [None] * len(rows)
+		for schedule, row in zip(schedules, self.rows):
+			unique[row] = schedule.values
+		length = max(len(values) for values in unique)
+		self.values = np.array([np.pad(values, (0, length - len(values)), mode='edge') for values in unique])
+		self._last = length - 1
+
+	def __call__(self, index):
+		return self.values[self.rows, np.minimum(index, self._last)]
+
+def make_schedule(kind, start, final, num_frames):
+	"""
+	Schedule from a command line description: linear, exponential, inverse_time, or
+	piecewise:<frame>=<value>,<frame>=<value>,... (start, final and num_frames are then unused).
+	"""
+	if kind.startswith('piecewise:'):
+		points = [point.split('=') for point in kind[len('piecewise:'):].split(',')]
+		return Schedule.piecewise([(int(frame), float(value)) for frame, value in points])
+	if kind not in ('linear', 'exponential', 'inverse_time'):
+		raise ValueError('schedule should be one of: linear, exponential, inverse_time, piecewise:<frame>=<value>,...')
+	if kind != 'linear' and min(start, final) <= 0:
+		raise ValueError('{} schedules need positive start and final values'.format(kind))
+	return getattr(Schedule, kind)(start, final, num_frames)
+
 class LRscheduler():
 
-	def __init__(self, lr_start, lr_final, num_frames):
+	def __init__(self, lr_start, lr_final, num_frames, kind='linear'):
 		self.lr_start = lr_start
 		self.lr_final = lr_final
 		self.num_frames = num_frames
+		self.schedule = make_schedule(kind, lr_start, lr_final, num_frames)
 
 	def get_lr(self, frame):
-		lr = self.lr_start - frame/float(self.num_frames)
-		return max(lr, self.lr_final)
+		return self.schedule(frame)
@@ -0,0 +1,122 @@
+"""
+Dynamic programming on the exact model of a tokens env (see gym_tokens.envs.model).
+The solvers return a q_matrix laid out like Q_Table.q_matrix, so it can be used as
+ground truth for a learned table or copied into one as a warm start.
+"""
+import numpy as np
+
+from gym_tokens.envs.model import state_id
+
+__all__ = ['value_iteration', 'policy_iteration', 'evaluate_actions', 'solve']
+
+class _Reachable:
+	"""
+	The model restricted to its reachable states, which are a small part of the Q-table rows.
+	"""
+	def __init__(self, mdp):
+		self.mdp = mdp
+		self.ids = mdp.state_ids
+		self.num_states = len(self.ids)
+		self.num_actions = mdp.num_actions
+		index = np.full(mdp.num_states, -1, dtype=np.int64)
+		index[self.ids] = np.arange(self.num_states)
+		self.index = index
+		self.rows = index[mdp.s] * self.num_actions + mdp.a
+		self.cols = index[mdp.next_state]
+		self.prob = mdp.prob
+		self.R = mdp.R[self.ids]
+		self.states = np.arange(self.num_states)
+		# every transition moves the clock forward, so terminal + 2 sweeps reach the fixed point
+		self.max_iter = mdp.terminal + 2
+
+	def expected_next(self, values):
+		"""
+		sum over s' of P(s'|s,a) * values[s'], transitions that end the game add nothing like is_done in Q_Table.get_TDerror.
+		"""
+		expected = np.bincount(self.rows, weights=self.prob * values[self.cols], minlength=self.num_states * self.num_actions)
+		return expected.reshape(self.num_states, self.num_actions)
+
+	def optimal(self, rewards, gamma=1.0, tol=1e-12):
+		q_matrix = rewards.copy()
+		for _ in range(self.max_iter):
+			new_q = rewards + gamma * self.expected_next(q_matrix.max(axis=1))
+			delta = np.max(np.abs(new_q - q_matrix))
+			q_matrix = new_q
+			if delta <= tol:
+				break
+		return q_matrix
+
+	def evaluate(self, actions, rewards, gamma=1.0):
+		q_matrix = rewards.copy()
+		for _ in range(self.max_iter):
+			new_q = rewards + gamma * self.expected_next(q_matrix[self.states, actions])
+			if np.array_equal(new_q, q_matrix):
+				break
+			q_matrix = new_q
+		return q_matrix
+
+	def to_q_matrix(self, q_matrix):
+		full = np.zeros((self.mdp.num_states, self.num_actions))
+		full[self.ids] = q_matrix
+		return full
+
+def value_iteration(mdp, gamma=1.0, tol=1e-12):
+	"""
+	Optimal discounted Q-values, the fixed point of the 'discounted' TD error of Q_Table.get_TDerror.
+	"""
+	reachable = _Reachable(mdp)
+	return reachable.to_q_matrix(reachable.optimal(reachable.R, gamma, tol))
+
+def evaluate_actions(mdp, actions, rewards=None, gamma=1.0):
+	"""
+	Q-values of the deterministic policy that takes action index actions[s] in state s.
+	"""
+	reachable = _Reachable(mdp)
+	rewards = reachable.R if rewards is None else rewards[reachable.ids]
+	return reachable.to_q_matrix(reachable.evaluate(np.asarray(actions)[reachable.ids], rewards, gamma))
+
+def policy_iteration(mdp, reward_type='average', ref_state=None, ref_action=0, tol=1e-12, max_iter=100):
+	"""
+	Optimal Q-values for the 'average' and 'rvi' TD errors of Q_Table.get_TDerror.
+	Games restart from the initial state, so a policy earning G per game in L steps has
+	average reward rho = G / L ('average'), while 'rvi' pins rho to Q(ref_state, ref_action).
+	Each iteration evaluates the policy to get its rho and then improves it with the optimal
+	Q-values of rewards R - rho. Returns the q_matrix and rho.
+	"""
+	if reward_type not in ('average', 'rvi'):
+		raise ValueError('reward_type should be one of: average, rvi')
+
+	reachable = _Reachable(mdp)
+	start = reachable.index[mdp.initial_state]
+	ref = start if ref_state is None else reachable.index[state_id(*ref_state, mdp.terminal)]
+	steps = np.ones_like(reachable.R)
+	actions = np.zeros(reachable.num_states, dtype=np.int64)
+
+	for _ in range(max_iter):
+		# the policy's q-values are q_reward - rho * q_steps, q_steps counts the steps left in the game
+		q_reward = reachable.evaluate(actions, reachable.R)
+		q_steps = reachable.evaluate(actions, steps)
+		if reward_type == 'average':
+			rho = q_reward[start, actions[start]] / q_steps[start, actions[start]]
+		else:
+			rho = q_reward[ref, ref_action] / (1 + q_steps[ref, ref_action])
+
+		q_matrix = reachable.optimal(reachable.R - rho, tol=tol)
+
+		# keep the current action on ties so the iteration cannot cycle
+		keep = q_matrix[reachable.states, actions] >= q_matrix.max(axis=1) - tol
+		new_actions = np.where(keep, actions, q_matrix.argmax(axis=1))
+		if np.array_equal(new_actions, actions):
+			break
+		actions = new_actions
+
+	return reachable.to_q_matrix(q_matrix), rho
+
+def solve(mdp, reward_type='discounted', gamma=1.0, ref_state=None, ref_action=0):
+	"""
+	Solves the model for any reward_type of Q_Table.get_TDerror.
+	Returns the q_matrix and the average reward (None for 'discounted').
+	"""
+	if reward_type == 'discounted':
+		return value_iteration(mdp, gamma), None
+	return policy_iteration(mdp, reward_type, ref_state=ref_state, ref_action=ref_action)
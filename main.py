@@ -5,14 +5,18 @@ import random
 
 import time
 import datetime
+import os
 import sys
 import utils
 import lib
-import pandas as pd
 
 import numpy as np
+from gym_tokens.envs.model import transition_model
+from gym_tokens.rng import BufferedRNG
 
 num_actions = 3
+# arguments a resumed run may change, the others must match its checkpoint
+RESUME_FREE_ARGS = ('model', 'resume', 'log_interval', 'save_interval', 'csv_log')
 
 def _sign(num):
 
@@ -36,12 +40,17 @@ def main():
 	parser.add_argument("--log_interval", type=int, default=1, help="number of updates between two logs (default: 1)")
 	parser.add_argument("--algo", default='sarsa', help="algorithm to use: sarsa | q-learning | e-sarsa | double-q")
 	parser.add_argument("--convg", type=float, default=0.00001, help="convergence value")
+	parser.add_argument('--exact_convergence', help='check convergence against a copy of the whole Q-table every step (slow)',action='store_true')
+	parser.add_argument("--q_storage", default="dense", help="Q-table rows: dense | reachable (only the states a game can reach, for large heights)")
+	parser.add_argument("--q_dtype", default="float64", help="Q-table values: float64 | float32")
 	parser.add_argument("--lr", type=float, default=0.1, help="learning rate")
 	parser.add_argument("--lr_final", type=float, default=0.0001, help="learning rate")
+	parser.add_argument("--lr_schedule", default="linear", help="learning rate decay: linear | exponential | inverse_time | piecewise:<game>=<lr>,...")
 	parser.add_argument("--save-interval", type=int, default=1000, help="number of updates between two saves (default: 30, 0 means no saving)")
 	parser.add_argument("--eps_start", type=float, default=1.0, help="initial epsilon-greedy value")
 	parser.add_argument("--eps_final", type=float, default=0.01, help="final epsilon-greedy value")
 	parser.add_argument("--eps_games", type=int, default=40000, help="number of frames for eps greedy to go from init value to final value (default: 75k)")
+	parser.add_argument("--eps_schedule", default="linear", help="epsilon decay: linear | exponential | inverse_time | piecewise:<frame>=<eps>,...")
 	parser.add_argument("--gamma", type=float, default=0.99, help="discount factor")
 	parser.add_argument("--height", type=int, default=15, help="game tree height")
 	parser.add_argument('--fancy_discount', help='use fancy discounting rewards',action='store_true')
@@ -51,6 +60,7 @@ def main():
 	parser.add_argument("--tmp_start", type=float, default=1.0, help="initial temperature value")
 	parser.add_argument("--tmp_final", type=float, default=0.01, help="final temperature value")
 	parser.add_argument("--tmp_games", type=int, default=10000, help="number of frames for temperature to go from init value to final value (default: 75k)")
+	parser.add_argument("--tmp_schedule", default="linear", help="temperature decay: linear | exponential | inverse_time | piecewise:<frame>=<tmp>,...")
 	parser.add_argument('--softmax', help='use softmax exploration',action='store_true')
 	parser.add_argument('--eps_soft', help='use epsilon soft exploration',action='store_true')
 	parser.add_argument('--variation', default="horizon", help='which variation')
@@ -59,6 +69,10 @@ def main():
 	parser.add_argument('--wait', default="unbiased", help='biased or unbiased wait action')
 	parser.add_argument('--avg_reward_step_size', type=float, default="0.99", help='step size')
 	parser.add_argument('--negative_reward', type=float, default=0.0, help='use negative reward')
+	parser.add_argument('--warm_start', help='start from the Q-table solved on the exact model of the env',action='store_true')
+	parser.add_argument('--csv_log', help='also export the per-game log to log.csv at the end of the run',action='store_true')
+	parser.add_argument('--resume', help='continue the run of --model from its last checkpoint',action='store_true')
+	parser.add_argument('--fused', help='choose actions and learn with one agent.step call per env step (sarsa then plays the next action its TD target used, the default loop draws a new one)',action='store_true')
 
 
 	args = parser.parse_args()
@@ -70,10 +84,26 @@ def main():
 	model_name = args.model or default_model_name
 	model_dir = utils.get_model_dir(model_name)
 
+	# Load training status, a checkpoint holds everything the training loop needs to continue a run bit for bit
+
+	checkpoint = utils.get_checkpoint(model_dir) if args.resume else None
+	if args.resume:
+		if checkpoint is None:
+			raise ValueError('--resume needs the checkpoint.pkl of a run in ' + model_dir)
+		# the tables, policy, trackers and lr schedule come from the checkpoint, so they must be built from the same arguments
+		changed = [name for name, value in checkpoint["args"].items() if name not in RESUME_FREE_ARGS and getattr(args, name, None) != value]
+		if changed:
+			raise ValueError('the checkpoint in {} was saved with other arguments: {}'.format(model_dir,
+				', '.join('--{} {}'.format(name, checkpoint["args"][name]) for name in changed)))
+
 	# Load loggers and Tensorboard writer
 
 	txt_logger = utils.get_txt_logger(model_dir)
-	csv_file, csv_logger = utils.get_csv_logger(model_dir)
+
+	status = checkpoint["status"] if checkpoint else {"num_frames": 0, "update": 0, "num_games":0, "num_games_prevs": 0, "episodes": 0, "log": 0, "avg_reward": 0}
+
+	# the stores drop the rows written after the checkpoint
+	episode_log = utils.get_episode_log(model_dir, args.height, num_rows=status["log"]) # binary log of the logged games, see utils.load_episode_log
 
 	# Log command and all script arguments
 
@@ -82,6 +112,8 @@ def main():
 
 	# Set seed for all randomness sources
 	utils.seed(args.seed)
+	env_seed, policy_seed, update_seed = utils.spawn_seeds(args.seed, 3)
+	update_rng = BufferedRNG(update_seed)
 
 	if args.fast_block:
 		block_discount = 0.25
@@ -89,19 +121,15 @@ def main():
 	else:
 		block_discount = 0.75
 
-	env = gym.make(args.env, alpha=block_discount, seed=args.seed, terminal=args.height, fancy_discount=args.fancy_discount, v=args.variation, negative_reward=args.negative_reward)
+	env = gym.make(args.env, alpha=block_discount, seed=env_seed, terminal=args.height, fancy_discount=args.fancy_discount, v=args.variation, negative_reward=args.negative_reward)
 	txt_logger.info("Environments loaded\n")
 
 	return_zero = False
 
-	# Load training status
-
-	# try:
-	# 	status = utils.get_status(model_dir)
-	# except OSError:
-	# 	status = {"num_frames": 0, "update": 0, "num_games":0}
-	status = {"num_frames": 0, "update": 0, "num_games":0}
-	txt_logger.info("Training status loaded\n")
+	if checkpoint:
+		txt_logger.info("Training status loaded, resuming after game {}\n".format(status["num_games"]))
+	else:
+		txt_logger.info("Training status loaded\n")
 
 	num_states = env.get_num_states()
 	num_actions = env.get_num_actions()
@@ -110,53 +138,61 @@ def main():
 	numNT = (args.height * 2) + 1  # -15 to 15
 	numHT = (args.height * 2) + 1 # -15 to 15
 
+	table_kwargs = dict(exact_convergence=args.exact_convergence, storage=args.q_storage, dtype=np.dtype(args.q_dtype))
 	# model = lib.Q_Table(env.get_num_states(), env.get_num_actions(), (numNT, numHT), args.convg)
 	if env.observation_space.shape[0] == 3:
 		if args.algo == 'double-q':
-			model = lib.Q_Table(numNT*numHT*(args.height+1), num_actions, (numNT, numHT, args.height), args.convg, args.height) 
-			model2 = lib.Q_Table(numNT*numHT*(args.height+1), num_actions, (numNT, numHT, args.height), args.convg, args.height)
+			model = lib.Q_Table(numNT*numHT*(args.height+1), num_actions, (numNT, numHT, args.height), args.convg, args.height, **table_kwargs) 
+			model2 = lib.Q_Table(numNT*numHT*(args.height+1), num_actions, (numNT, numHT, args.height), args.convg, args.height, **table_kwargs)
 		else:
-			model = lib.Q_Table(numNT*numHT*(args.height+1), num_actions, (numNT, numHT, args.height), args.convg, args.height) 
+			model = lib.Q_Table(numNT*numHT*(args.height+1), num_actions, (numNT, numHT, args.height), args.convg, args.height, **table_kwargs) 
 	else:
 		if args.algo == 'double-q':
-			model = lib.Q_Table(numNT*numHT, num_actions, (numNT, numHT), args.convg, args.height) 
-			model2 = lib.Q_Table(numNT*numHT, num_actions, (numNT, numHT), args.convg, args.height)
+			model = lib.Q_Table(numNT*numHT, num_actions, (numNT, numHT), args.convg, args.height, **table_kwargs) 
+			model2 = lib.Q_Table(numNT*numHT, num_actions, (numNT, numHT), args.convg, args.height, **table_kwargs)
 		else:
-			model = lib.Q_Table(numNT*numHT, num_actions, (numNT, numHT), args.convg, args.height) 
+			model = lib.Q_Table(numNT*numHT, num_actions, (numNT, numHT), args.convg, args.height, **table_kwargs) 
 
+	if args.warm_start:
+		q_matrix, avg_reward = lib.solve(transition_model(env), args.reward_type, args.gamma)
+		for table in ([model, model2] if args.algo == 'double-q' else [model]):
+			table.set_dense_q_matrix(q_matrix)
+			if avg_reward is not None:
+				table.avg_reward = avg_reward
+		txt_logger.info("Q-table warm started from the exact model\n")
 
 	#NOTE why the number of states is the way it is ? num_states x (height + 2)
 
 	if args.softmax:
-		policy = lib.SoftmaxPolicy()
+		policy = lib.SoftmaxPolicy(rng=policy_seed)
 		if args.fancy_tmp:
-			tmp_track = lib.TemperatureTracker(args.tmp_start, args.tmp_final, args.tmp_games, policy) # tmp is changed from game to game
+			tmp_track = lib.TemperatureTracker(args.tmp_start, args.tmp_final, args.tmp_games, policy, args.tmp_schedule) # tmp is changed from game to game
 		else:
-			tmp_track = lib.TemperatureTracker(args.tmp_start, args.tmp_final, args.tmp_games*args.height, policy)
+			tmp_track = lib.TemperatureTracker(args.tmp_start, args.tmp_final, args.tmp_games*args.height, policy, args.tmp_schedule)
 
 	elif args.eps_soft:
-		policy = lib.EpsilonSoftPolicy()
+		policy = lib.EpsilonSoftPolicy(rng=policy_seed)
 		if args.fancy_eps:
-			eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy)
+			eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy, args.eps_schedule)
 		else:
-			eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games*args.height, policy)
+			eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games*args.height, policy, args.eps_schedule)
 
 	elif args.fancy_eps:
 		#TODO
-		policy = lib.EpsilonGreedyGamePolicy()
-		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy)
+		policy = lib.EpsilonGreedyGamePolicy(rng=policy_seed)
+		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy, args.eps_schedule)
 
 	elif args.wait == 'unbiased':
-		policy = lib.EpsilonGreedyPolicy()
-		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy)
+		policy = lib.EpsilonGreedyPolicy(rng=policy_seed)
+		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy, args.eps_schedule)
 
 	elif args.wait == 'baised':
-		policy = lib.EpsilonGreedyBiasedPolicy()
-		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy)
+		policy = lib.EpsilonGreedyBiasedPolicy(rng=policy_seed)
+		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy, args.eps_schedule)
 
 	else:
-		policy = lib.EpsilonGreedyGamePolicy(epsilon=args.eps_start)
-		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games*args.height, policy) # args.eps_games*args.height is the number of total time_step for decreasing epsilon
+		policy = lib.EpsilonGreedyGamePolicy(epsilon=args.eps_start, rng=policy_seed)
+		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games*args.height, policy, args.eps_schedule) # args.eps_games*args.height is the number of total time_step for decreasing epsilon
 
 	if args.algo == 'sarsa': 
 		monkeyAgent = lib.SarsaAgent(policy, model, args.height)
@@ -168,46 +204,51 @@ def main():
 		monkeyAgent = lib.ExpectedSARSA(policy, model, args.height)
 
 	elif args.algo == 'double-q':
-		monkeyAgent = lib.DoubleQLearning(policy, model, model2, args.height)
+		monkeyAgent = lib.DoubleQLearning(policy, model, model2, args.height, rng=update_rng)
 
-	lr_sched = lib.LRscheduler(args.lr, args.lr_final, total_run_time_steps) 
+	lr_sched = lib.LRscheduler(args.lr, args.lr_final, total_run_time_steps, args.lr_schedule)
+	tracker = tmp_track if args.softmax else eps_track
 	#NOTE is there is reason that lr is not decreased to the final value during the experiment?
 
 	num_frames = status["num_frames"]
 	update = status["update"]
 	num_games = status["num_games"]
-	num_games_prevs = 0
+	num_games_prevs = status["num_games_prevs"]
 
 	start_time = time.time()
-	totalReturns = [] # Return per episode
-	totalLoss = [] # loss trajectory
+	totalLoss = [] # loss trajectory of the current game
+	stats = utils.EpisodeStats(args.height) # returns, losses, correct choices and decision times of the games
 
 	env.set_reward(args.reward)
 
 	state, game_time_step  = env.reset()
-	decisionTime = []
-	lossPerEpisode = []
 	train_info = []
 
-	last_choice = 0
-
-	decisionTime = np.zeros(shape=((args.height*2)+1)) # histogram of decision times per episode
-	#NOTE why first 15 elements are always empty
-
 	# info = []
 
-	traj_group = []
-
-	choice_made = []
-	correct_choice = []
-	finalDecisionTime = []
-	finalRewardPerGame = []
-	numCorrectChoice = 0
-	numRecentCorrectChoice = []
-	avg_reward = []
-	avg_reward_episode = []
+	# finished games and the average reward estimates are appended to column files in model_dir, see utils.EpisodeStore
+	episode_store = utils.EpisodeStore(model_dir, args.height, num_rows=status["episodes"])
+	if args.reward_type == 'average':
+		avg_reward_store = utils.ColumnStore(os.path.join(model_dir, 'avg_reward'), {'avg_reward': ('float64', ())}, num_rows=status["avg_reward"])
+	log_game = None # log row of the first game since the last log
 
 	took_action = False
+	action = None # the fused agent chooses the first action of a game with act, step chooses the others
+	ref_state = np.array([0,0,0])
+	fused_reward_type = args.reward_type if args.algo in ('sarsa', 'q-learning') else 'discounted'
+
+	if checkpoint:
+		# the objects are pickled together, so the agent, policy and tracker still share their tables and rngs
+		model, model2, policy, tracker, monkeyAgent = checkpoint["model"], checkpoint["model2"], checkpoint["policy"], checkpoint["tracker"], checkpoint["agent"]
+		lr_sched, update_rng, stats = checkpoint["lr_sched"], checkpoint["update_rng"], checkpoint["stats"]
+		if args.softmax:
+			tmp_track = tracker
+		else:
+			eps_track = tracker
+		env.unwrapped.__dict__.update(checkpoint["env"])
+		state, game_time_step, action, took_action, log_game, totalLoss = checkpoint["loop"]
+		random.setstate(checkpoint["random"])
+		np.random.set_state(checkpoint["np_random"])
 
 	# df = pd.DataFrame([], columns = ["trajectory", "choice_made", "correct_choice", "decision_time", "reward_received"])
 
@@ -237,7 +278,12 @@ def main():
 		# env.render()
 		# time.sleep(0.25)
 
-		if env.v == 'horizon' and return_zero:
+		if args.fused:
+			if action is None:
+				action = monkeyAgent.act(state)
+			next_state, reward, is_done, game_time_step = env.step(action)
+
+		elif env.v == 'horizon' and return_zero:
 			if not took_action:
 				action = monkeyAgent.get_actions(state, False, game_time_step)
 				next_state, reward, is_done, game_time_step = env.step(action)
@@ -255,13 +301,19 @@ def main():
 
 		lr = lr_sched.get_lr(num_games) # learning rate is changed from timestep to timestep
 		
-		if args.algo == 'sarsa':
+		if args.fused:
+			# like the default loop, e-sarsa and double-q always learn the discounted target
+			action, loss = monkeyAgent.step(state, reward, next_state, is_done, lr, args.gamma, fused_reward_type, ref_state)
+			if args.reward_type == 'average' and args.algo in ('sarsa', 'q-learning'):
+				model.set_avg_reward(loss, args.avg_reward_step_size, lr)
+				avg_reward_store.append(avg_reward=model.avg_reward)
+		elif args.algo == 'sarsa':
 			next_act = monkeyAgent.get_actions(next_state, False, game_time_step)
 			loss = model.get_TDerror(state, action, next_state, next_act, reward, args.gamma, is_done, args.algo, reward_type=args.reward_type)
 			converged = model.update_qVal(lr, state, action, loss)
 			if args.reward_type == 'average':
 				model.set_avg_reward(loss, args.avg_reward_step_size, lr)
-				avg_reward.append(model.avg_reward)
+				avg_reward_store.append(avg_reward=model.avg_reward)
 		elif args.algo == 'e-sarsa':
 			next_act, probs = monkeyAgent.get_actions(next_state, True, game_time_step)
 			loss = model.get_TDerror(state, action, next_state, probs, reward, args.gamma, is_done, args.algo)
@@ -269,66 +321,39 @@ def main():
 		else:
 			next_act = None
 			if args.algo == 'double-q':
-				if np.random.binomial(1,0.5):
+				if update_rng.random() < 0.5:
 					loss = model.get_TDerror(state, action, next_state, next_act, reward, args.gamma, is_done, args.algo, model2)
 					converged = model.update_qVal(lr, state, action, loss)
 				else:
-					loss2 = model2.get_TDerror(state, action, next_state, next_act, reward, args.gamma, is_done, args.algo, model)
-					converged = model2.update_qVal(lr, state, action, loss2)
+					loss = model2.get_TDerror(state, action, next_state, next_act, reward, args.gamma, is_done, args.algo, model)
+					converged = model2.update_qVal(lr, state, action, loss)
 			else: # for q-learning
 				if args.reward_type == 'rvi':
-					ref_state = np.array([0,0,0])
 					loss = model.get_TDerror(state, action, next_state, next_act, reward, args.gamma, is_done, args.algo, reward_type=args.reward_type, ref_state=ref_state, ref_action = 0)
 				else:
 					loss = model.get_TDerror(state, action, next_state, next_act, reward, args.gamma, is_done, args.algo, reward_type=args.reward_type)
 				converged = model.update_qVal(lr, state, action, loss)
 				if args.reward_type == 'average':
 					model.set_avg_reward(loss, args.avg_reward_step_size, lr)
-					avg_reward.append(model.avg_reward)
+					avg_reward_store.append(avg_reward=model.avg_reward)
 
 		totalLoss.append(loss) # loss trajectory
 
 		if is_done:
-			avg_reward_episode.append(model.avg_reward)
 			env.close()
 			num_games+=1
 
-			if args.env == 'tokens-v3' or args.env == 'tokens-v4':
-				totalReturns.append(env.reward) # reward per episode
-				if env.reward > 0:
-					numCorrectChoice += 1
-					numRecentCorrectChoice.append(1)
-				else:
-					numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
-
-			else:
-				totalReturns.append(reward) # reward per episode
-				if reward > 0:
-					numCorrectChoice += 1
-					numRecentCorrectChoice.append(1)
-				else:
-					numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
-
-			lossPerEpisode.append(np.sum(totalLoss))
+			game_reward = env.reward if args.env == 'tokens-v3' or args.env == 'tokens-v4' else reward
+			# taking abs means that decision step is always between 15 and 31, waiting means no decision till the end
+			stats.add_game(game_reward, abs(next_state[1]), loss=np.sum(totalLoss), waited=abs(next_state[1]) == args.height+1 or abs(next_state[1]) == 0)
 			totalLoss = []
 
-			decision_step = model._augState(abs(next_state[1])) # taking abs means that decision step is always between 15 and 31
-			decisionTime[decision_step-1] += 1 # after each episode is done, one is added to the corresponding element in decision time,
-			# so after 100 episodes, we have a histogram of decision times
-
-			if abs(next_state[1]) == args.height+1 or abs(next_state[1]) == 0: # if we made no decision till the end
-				last_choice += 1 # last choice represents the number of episodes in which we waited until the end
-
 			traj = env.get_trajectory()
-			choice_made.append(_sign(next_state[1])) # these arays are updated after each episode, not after each timestep
-			correct_choice.append(_sign(traj[-1]))
-			finalDecisionTime.append(abs(next_state[1])) # Why next_state? because it is the latest state that we have and we don't update state until after the if-else condition
-			if args.env == 'tokens-v3' or args.env == 'tokens-v4':
-				finalRewardPerGame.append(env.reward)
-			else:
-				finalRewardPerGame.append(reward)
-
-			traj_group.append(traj) # the list of all trajectories over all episodes
+			# decision time from next_state because it is the latest state that we have and we don't update state until after the if-else condition
+			game = [list(traj), _sign(next_state[1]), _sign(traj[-1]), abs(next_state[1]), game_reward]
+			episode_store.add_game(*game, avg_reward=model.avg_reward)
+			if log_game is None:
+				log_game = game
 			next_state, game_time_step = env.reset()
 			took_action = False
 		
@@ -339,25 +364,19 @@ def main():
 
 		if num_games > num_games_prevs and num_games % args.log_interval == 0: # if the game has not stpped and we moved an episode forward
 			duration = int(time.time() - start_time)
-			totalLoss_val = np.sum(lossPerEpisode) # sum of all episodic losses
-			totalReturn_val = np.sum(totalReturns) # sum of all episodic returns
-
-			avg_loss = np.mean(lossPerEpisode[-1000:])
-			avg_returns = np.mean(totalReturns[-1000:])
-			recent_correct = np.mean(numRecentCorrectChoice[-1000:])
 
 			header = ["update", "frames", "Games", "duration"]
 			data = [update, num_frames, num_games, duration] # update and num_frames are +=15 ed
 
 			if args.softmax:
 				header += ["tmp", "lr", "last"]
-				data += [policy.temperature, lr, last_choice]
+				data += [policy.temperature, lr, stats.num_waited]
 			else:
 				header += ["eps", "lr", "last"]
-				data += [policy.epsilon, lr, last_choice]
+				data += [policy.epsilon, lr, stats.num_waited]
 
 			header += ["Loss", "Returns", "Avg Loss", "Avg Returns", "Correct Percentage", "Recent Correct", "decision_time"]
-			data += [totalLoss_val.item(), totalReturn_val.item(), avg_loss.item(), avg_returns.item(), numCorrectChoice/num_games, recent_correct, finalDecisionTime[num_games_prevs]]
+			data += [stats.total_loss, stats.total_return, stats.avg_loss(), stats.avg_return(), stats.correct_percentage(), stats.recent_correct(), log_game[3]]
 
 			if args.softmax:
 				txt_logger.info(
@@ -371,38 +390,47 @@ def main():
 			# header += ["Loss", "Returns", "Avg Loss", "Avg Returns"]
 			# data += [totalLoss_val, totalReturn_val, avg_loss, avg_returns]
 
-			csv_header = ["trajectory", "choice_made", "correct_choice", "decision_time", "reward_received"]
-			csv_data = [traj_group[num_games_prevs], choice_made[num_games_prevs], correct_choice[num_games_prevs], finalDecisionTime[num_games_prevs], finalRewardPerGame[num_games_prevs]]
-
-			if num_games == 1:
-				csv_logger.writerow(csv_header)
-			csv_logger.writerow(csv_data)
-			csv_file.flush()
-
-			# df = pd.DataFrame({"trajectory": traj_group, 
-			# 						"choice_made": choice_made,
-			# 						"correct_choice": correct_choice,
-			# 						"decision_time": finalDecisionTime,
-			# 						"reward_received": finalRewardPerGame})
-
-			# df.append(tmp_df, ignore_index=True)
+			episode_log.add_game(*log_game, avg_reward=model.avg_reward)
 
 			num_games_prevs = num_games
+			log_game = None
 
 		# Save status
 		if args.save_interval > 0 and num_games % args.save_interval == 0:
 			# status = {"num_frames": num_frames, "update": update, "games": num_games, "totalReturns" : totalReturns}
 			model.save_q_state(model_dir, num_games)
-			np.save(model_dir+'/decisionTime_'+str(num_games)+'.npy', decisionTime)
-			np.save(model_dir+'/avg_reward_'+str(num_games)+'.npy', avg_reward)
-			np.save(model_dir+'/avg_reward_episode_'+str(num_games)+'.npy', avg_reward_episode)
-			pd.DataFrame({"trajectory": traj_group, 
-									"choice_made": choice_made,
-									"correct_choice": correct_choice,
-									"decision_time": finalDecisionTime,
-									"reward_received": finalRewardPerGame}).to_pickle(model_dir+'/df_'+str(num_games)+'.pkl')
+			np.save(model_dir+'/decisionTime_'+str(num_games)+'.npy', stats.decision_hist)
+			# only the games since the last save are written, utils.load_episode_dataframe(model_dir, num_games) reads them back as the old df_<games>.pkl
+			episode_store.flush()
+			episode_log.flush()
+			if args.reward_type == 'average':
+				avg_reward_store.flush()
+
+			if is_done: # once per save, right after the game ended
+				# norm of the Q-table changes made since the previous save, it goes to 0 as the table converges
+				tables = [model, model2] if args.algo == 'double-q' else [model]
+				txt_logger.info("Q change since last save: " + " | ".join("{:.6f} in {} updates".format(table.get_window_norm(), table.window_updates) for table in tables))
+				for table in tables:
+					table.reset_convergence_window()
+
+				utils.save_checkpoint({
+					"args": vars(args),
+					"status": {"num_frames": num_frames, "update": update, "num_games": num_games, "num_games_prevs": num_games_prevs,
+						"episodes": len(episode_store), "log": len(episode_log), "avg_reward": len(avg_reward_store) if args.reward_type == 'average' else 0},
+					"model": model, "model2": model2 if args.algo == 'double-q' else None, "policy": policy, "tracker": tracker, "agent": monkeyAgent,
+					"lr_sched": lr_sched, "update_rng": update_rng, "stats": stats, "env": env.unwrapped.__dict__,
+					"loop": (state, game_time_step, action, took_action, log_game, totalLoss),
+					"random": random.getstate(), "np_random": np.random.get_state(),
+				}, model_dir)
 			# txt_logger.info("Status saved")
 			# utils.save_status(status, model_dir)
 
+	episode_store.close()
+	episode_log.close()
+	if args.csv_log:
+		utils.export_csv(model_dir)
+	if args.reward_type == 'average':
+		avg_reward_store.close()
+
 if __name__ == '__main__':
 	main()
\ No newline at end of file
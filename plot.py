@@ -8,6 +8,7 @@ import numpy as np
 import pandas as pd
 import os
 import sys
+import utils
 #plotting
 import matplotlib.pyplot as pl
 import seaborn as sns
@@ -39,8 +40,10 @@ T=11
 
 gamma=3/4
 
-df_sarsa=pd.read_csv(dataroot+'/log.csv',sep=',')
-df_sarsa.trajectory=df_sarsa.trajectory.apply(lambda row: np.asarray([int(x) for x in row[1:-1].split(', ')])) # tarjectory is string, turn it to numpy array
+log=utils.load_episode_log(dataroot) # numpy arrays of the binary per-game log (or of log.csv for older runs)
+df_sarsa=pd.DataFrame({'trajectory': [row[:n].astype(int) for row, n in zip(log['trajectory'], log['length'])],
+    'choice_made': log['choice_made'].astype(int), 'correct_choice': log['correct_choice'].astype(int),
+    'decision_time': log['decision_time'].astype(int), 'reward_received': log['reward_received'].astype(float)})
 df_sarsa.rename(columns={'trajectory':'seq'},inplace=True)
 df_sarsa.rename(columns={'choice_made':'nChoiceMade'},inplace=True)
 df_sarsa.rename(columns={'correct_choice':'nCorrectChoice'},inplace=True)
@@ -102,25 +102,18 @@ def reinforce2():
 	start_time = time.time()
 	episode_loss_trajectory = [] # loss trajectory
 
-	episodes_decison_times = []
-	episodes_loss = []
-
-	episodes_decison_times = np.zeros(shape=((args.height*2)+1)) # histogram of decision times per episode
-	#NOTE why first 15 elements are always empty
+	stats = utils.EpisodeStats(args.height) # returns, correct choices and decision times of the episodes
 
 	episode_choice = [] # choise of each episode
 	correct_choice = []
 	final_episode_decison_time = []
 	episode_returns = []
-	numCorrectChoice = 0
-	numRecentCorrectChoice = []
 
 	lr = args.lr
 	h_dim_p = 128
 	input_shape = env.observation_space.shape[0]
 
 
-	last = 0
 	policy_network = lib.PolicyNetwork(input_shape, h_dim_p , num_actions)
 	optimizer = optim.Adam(policy_network.parameters(), lr=0.001)
 
@@ -162,33 +155,13 @@ def reinforce2():
 
 		num_episode+=1
 		run_trajectories.append(env.get_trajectory())
-		decision_step = _augState(abs(s[1]), args.height) # taking abs means that decision step is always between 15 and 31
-		episodes_decison_times[decision_step-1] += 1 # after each episode is done, one is added to the corresponding element in decision time,
-		#FIXME check the index
-		# so after 100 episodes, we have a histogram of decision times
-
-		if abs(s[1]) == args.height+1: # if we made no decision till the end
-			last += 1 # last choice represents the number of episodes in which we waited until the end
-
 		episode_choice.append(_sign(s[1])) # these arays are updated after each episode, not after each timestep
 		correct_choice.append(_sign(env.trajectory[-1]))
 		final_episode_decison_time.append(abs(s[1])) # Why next_state? because it is the latest state that we have and we don't update state until after the if-else condition
 
-		if args.env == 'tokens-v3' or args.env == 'tokens-v4':
-			episode_returns.append(env.reward) # reward per episode
-			if env.reward > 0:
-				numCorrectChoice += 1
-				numRecentCorrectChoice.append(1)
-			else:
-				numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
-
-		else:
-			episode_returns.append(reward) # reward per episode
-			if reward > 0:
-				numCorrectChoice += 1
-				numRecentCorrectChoice.append(1)
-			else:
-				numRecentCorrectChoice.append(0) # binary value, correct choice or not per episode
+		episode_returns.append(env.reward if args.env == 'tokens-v3' or args.env == 'tokens-v4' else reward) # reward per episode
+		# taking abs means that decision step is always between 15 and 31, waiting means no decision till the end
+		stats.add_game(episode_returns[-1], abs(s[1]), waited=abs(s[1]) == args.height+1)
 
 		# compute returns and save them in an array (source: https://stackoverflow.com/questions/47970683/vectorize-a-numpy-discount-calculation)
 		c = [1, -args.gamma]
@@ -218,21 +191,15 @@ def reinforce2():
 		if num_episode > prev_num_episode and num_episode % args.log_interval == 0: # if the game has not stpped and we moved an episode forward
 
 			duration = int(time.time() - start_time)
-			episode_total_loss = np.sum(episodes_loss) # sum of all episodic losses
-			totalReturn_val = np.sum(episode_returns) # sum of all episodic returns
-
-			avg_loss = np.mean(episodes_loss[-1000:])
-			avg_returns = np.mean(episode_returns[-1000:])
-			recent_correct = np.mean(numRecentCorrectChoice[-1000:])
 
 			header = ["Games", "duration"]
 			data = [num_episode, duration] # update and num_frames are +=15 ed
 
 			header += ["lr", "last"]
-			data += [lr, last]
+			data += [lr, stats.num_waited]
 
 			header += ["Returns", "Avg Returns", "Correct Percentage", "Recent Correct", "decision_time"]
-			data += [totalReturn_val.item(), avg_returns.item(), numCorrectChoice/num_episode, recent_correct, final_episode_decison_time[prev_num_episode]]
+			data += [stats.total_return, stats.avg_return(), stats.correct_percentage(), stats.recent_correct(), final_episode_decison_time[prev_num_episode]]
 
 			txt_logger.info(
 				"G {} | D {} | LR {:.5f} | Last {} | R {:.3f} | Avg R {:.3f} | Avg C {:.3f} | Rec C {:.3f} | DT {}"
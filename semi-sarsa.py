@@ -63,6 +63,7 @@ def semiSARSA():
 	parser.add_argument('--softmax', help='use softmax exploration',action='store_true')
 	parser.add_argument('--eps_soft', help='use epsilon soft exploration',action='store_true')
 	parser.add_argument('--variation', default="horizon", help='which variation')
+	parser.add_argument('--csv_log', help='also export the per-game log to log.csv at the end of the run',action='store_true')
 
 
 	args = parser.parse_args()
@@ -77,7 +78,7 @@ def semiSARSA():
 	# Load loggers and Tensorboard writer
 
 	txt_logger = utils.get_txt_logger(model_dir)
-	csv_file, csv_logger = utils.get_csv_logger(model_dir)
+	episode_log = utils.get_episode_log(model_dir, args.height) # binary log of the logged games, see utils.load_episode_log
 
 	# Log command and all script arguments
 
@@ -86,6 +87,7 @@ def semiSARSA():
 
 	# Set seed for all randomness sources
 	utils.seed(args.seed)
+	env_seed, policy_seed = utils.spawn_seeds(args.seed, 2)
 
 	if args.fast_block:
 		block_discount = 0.25
@@ -93,7 +95,7 @@ def semiSARSA():
 	else:
 		block_discount = 0.75
 
-	env = gym.make(args.env, gamma=block_discount, seed=args.seed, terminal=args.height, fancy_discount=args.fancy_discount, v = args.variation)
+	env = gym.make(args.env, gamma=block_discount, seed=env_seed, terminal=args.height, fancy_discount=args.fancy_discount, v = args.variation)
 	txt_logger.info("Environments loaded\n")
 
 	status = {"num_frames": 0, "update": 0, "num_games":0}
@@ -115,18 +117,18 @@ def semiSARSA():
 	model = lib.Weight(dimension, args.convg, args.height, shape)
 
 	if args.softmax:
-		policy = lib.SoftmaxPolicy()
+		policy = lib.SoftmaxPolicy(rng=policy_seed)
 		if args.fancy_tmp:
 			tmp_track = lib.TemperatureTracker(args.tmp_start, args.tmp_final, args.tmp_games, policy) # tmp is changed from game to game
 		else:
 			tmp_track = lib.TemperatureTracker(args.tmp_start, args.tmp_final, args.tmp_games*args.height, policy)
 
 	elif args.eps_soft:
-		policy = lib.EpsilonSoftPolicy()
+		policy = lib.EpsilonSoftPolicy(rng=policy_seed)
 		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy)
 
 	else:
-		policy = lib.EpsilonGreedyPolicy(epsilon=args.eps_start)
+		policy = lib.EpsilonGreedyPolicy(epsilon=args.eps_start, rng=policy_seed)
 		eps_track = lib.EpsilonTracker(args.eps_start,args.eps_final, args.eps_games, policy) # args.eps_games*args.height is the number of total time_step for decreasing epsilon
 
 
@@ -254,13 +256,7 @@ def semiSARSA():
 					"U {} | F {} | G {} | D {} | EPS {:.5f} | LR {:.5f} | Last {} | R {:.3f} | Avg R {:.3f} | Avg C {:.3f} | Rec C {:.3f} | DT {}"
 					.format(*data))
 
-			csv_header = ["trajectory", "choice_made", "correct_choice", "decision_time", "reward_received"]
-			csv_data = [traj_group[num_games_prevs], choice_made[num_games_prevs], correct_choice[num_games_prevs], finalDecisionTime[num_games_prevs], finalRewardPerGame[num_games_prevs]]
-
-			if num_games == 1:
-				csv_logger.writerow(csv_header)
-			csv_logger.writerow(csv_data)
-			csv_file.flush()
+			episode_log.add_game(traj_group[num_games_prevs], choice_made[num_games_prevs], correct_choice[num_games_prevs], finalDecisionTime[num_games_prevs], finalRewardPerGame[num_games_prevs])
 
 			num_games_prevs = num_games
 
@@ -268,6 +264,11 @@ def semiSARSA():
 		if args.save_interval > 0 and num_games % args.save_interval == 0:
 			model.save_w(model_dir, num_games)
 			np.save(model_dir+'/decisionTime_'+str(num_games)+'.npy', decisionTime)
+			episode_log.flush()
+
+	episode_log.close()
+	if args.csv_log:
+		utils.export_csv(model_dir)
 
 if __name__ == "__main__":
 	semiSARSA()
\ No newline at end of file
@@ -0,0 +1,150 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+import lib
+import utils
+from gym_tokens.envs import TokensVecEnv, TokensVecEnv2
+
+VEC_ENVS = {
+	'tokens-v0': TokensVecEnv,
+	'tokens-v1': TokensVecEnv2,
+}
+
+# hyper-parameters that take one value per run, the sweep is their grid
+GRID = ['lr', 'lr_final', 'gamma', 'eps_start', 'eps_final', 'eps_games', 'tmp_start', 'tmp_final', 'tmp_games']
+
+def make_grid(args):
+	'''
+	: return (list) : one argparse.Namespace per run, with the main.py arguments of the run
+	All runs share the sweep's seed, their games come from their own rows of one vectorized env,
+	so repeats only differ by their repeat index.
+	'''
+	runs = []
+	for values in itertools.product(*[getattr(args, name) for name in GRID]):
+		for repeat in range(args.repeats):
+			run_args = argparse.Namespace(**vars(args))
+			for name, value in zip(GRID, values):
+				setattr(run_args, name, value)
+			run_args.repeat = repeat
+			runs.append(run_args)
+	return runs
+
+def run_array(runs, name):
+	return np.array([getattr(run_args, name) for run_args in runs], dtype=np.float64)
+
+def main():
+
+	parser = argparse.ArgumentParser(description="train a grid of tabular learners in lockstep, one run per row of a vectorized env")
+	parser.add_argument("--games", type=int, default=10000, help="number of games of every run")
+	parser.add_argument("--env", default='tokens-v0', help="tokens-v0 | tokens-v1")
+	parser.add_argument("--model", default=None, help="prefix of the run directories (default: sweep_{ENV}_{ALGO}_{TIME})")
+	parser.add_argument("--seed", type=int, default=7, help="random seed (default: 7)")
+	parser.add_argument("--repeats", type=int, default=1, help="number of runs of every grid point")
+	parser.add_argument("--algo", default='q-learning', help="algorithm to use: sarsa | q-learning | e-sarsa | double-q")
+	parser.add_argument("--lr", type=float, nargs="+", default=[0.1], help="learning rates")
+	parser.add_argument("--lr_final", type=float, nargs="+", default=[0.0001], help="final learning rates")
+	parser.add_argument("--lr_schedule", default="linear", help="learning rate decay: linear | exponential | inverse_time | piecewise:<game>=<lr>,...")
+	parser.add_argument("--gamma", type=float, nargs="+", default=[0.99], help="discount factors")
+	parser.add_argument("--softmax", help="use softmax exploration", action="store_true")
+	parser.add_argument("--eps_start", type=float, nargs="+", default=[1.0], help="initial epsilon-greedy values")
+	parser.add_argument("--eps_final", type=float, nargs="+", default=[0.01], help="final epsilon-greedy values")
+	parser.add_argument("--eps_games", type=int, nargs="+", default=[40000], help="number of frames for epsilon to go from init value to final value")
+	parser.add_argument("--eps_schedule", default="linear", help="epsilon decay: linear | exponential | inverse_time | piecewise:<frame>=<eps>,...")
+	parser.add_argument("--tmp_start", type=float, nargs="+", default=[1.0], help="initial temperature values")
+	parser.add_argument("--tmp_final", type=float, nargs="+", default=[0.01], help="final temperature values")
+	parser.add_argument("--tmp_games", type=int, nargs="+", default=[10000], help="number of games for the temperature to go from init value to final value")
+	parser.add_argument("--tmp_schedule", default="linear", help="temperature decay: linear | exponential | inverse_time | piecewise:<frame>=<tmp>,...")
+	parser.add_argument("--height", type=int, default=15, help="game tree height")
+	parser.add_argument("--fancy_discount", help="use fancy discounting rewards", action="store_true")
+	parser.add_argument("--fast_block", help="fast block discounting", action="store_true")
+	parser.add_argument("--variation", default="horizon", help="which variation")
+	parser.add_argument("--reward", type=int, default=1, help="fixed reward")
+	parser.add_argument("--reward_type", default="discounted", help="reward type")
+	parser.add_argument("--avg_reward_step_size", type=float, default=0.99, help="step size")
+	parser.add_argument("--negative_reward", type=float, default=0.0, help="use negative reward")
+	parser.add_argument("--save-interval", type=int, default=1000, help="number of games between two saves of a run (0 means no saving)")
+
+	args = parser.parse_args()
+
+	if args.env not in VEC_ENVS:
+		raise ValueError('env should be one of: ' + ', '.join(VEC_ENVS))
+
+	runs = make_grid(args)
+	date = time.strftime("%y-%m-%d-%H-%M-%S")
+	prefix = args.model or f"sweep_{args.env}_{args.algo}_{date}"
+	run_dirs = [utils.get_model_dir("{}_{:03d}".format(prefix, i)) for i in range(len(runs))]
+
+	# every run gets the log.txt of the main.py run it stands for, so evaluate.py can read it
+	for run_dir, run_args in zip(run_dirs, runs):
+		os.makedirs(run_dir, exist_ok=True)
+		with open(os.path.join(run_dir, 'log.txt'), 'w') as f:
+			f.write("{}\n\n{}\n\n".format(" ".join(sys.argv), run_args))
+
+	env_seed, learner_seed = utils.spawn_seeds(args.seed, 2)
+	env_kwargs = {'negative_reward': args.negative_reward} if args.env == 'tokens-v0' else {}
+	vec_env = VEC_ENVS[args.env](len(runs), 0.25 if args.fast_block else 0.75, seed=env_seed,
+		terminal=args.height, fancy_discount=args.fancy_discount, v=args.variation, **env_kwargs)
+	vec_env.set_reward(args.reward)
+
+	# epsilon decays over eps_games steps and the temperature over tmp_games games of height steps, like main.py
+	if args.softmax:
+		explore_schedule = [lib.make_schedule(args.tmp_schedule, r.tmp_start, r.tmp_final, r.tmp_games * args.height) for r in runs]
+	else:
+		explore_schedule = [lib.make_schedule(args.eps_schedule, r.eps_start, r.eps_final, r.eps_games) for r in runs]
+	lr_schedule = [lib.make_schedule(args.lr_schedule, r.lr, r.lr_final, args.games) for r in runs]
+
+	learner = lib.MultiRunQLearning(vec_env, algo=args.algo, exploration='softmax' if args.softmax else 'epsilon', reward_type=args.reward_type,
+		gamma=run_array(runs, 'gamma'), lr_schedule=lr_schedule, explore_schedule=explore_schedule,
+		avg_reward_step_size=args.avg_reward_step_size, rng=learner_seed)
+
+	csv_files = [open(os.path.join(run_dir, 'log.csv'), 'w', newline='') for run_dir in run_dirs]
+	csv_loggers = [csv.writer(f) for f in csv_files]
+	for csv_logger in csv_loggers:
+		csv_logger.writerow(["games", "frames", "tmp" if args.softmax else "eps", "lr", "Avg Returns", "Correct Percentage", "decision_time"])
+
+	# statistics of the games played since the last save of every run
+	returns = np.zeros(len(runs))
+	correct = np.zeros(len(runs))
+	decision_time = np.zeros(len(runs))
+	games = np.zeros(len(runs))
+
+	print("{} runs of {} games".format(len(runs), args.games))
+	start_time = time.time()
+
+	while learner.active.any():
+		finished = learner.active.copy()
+		rewards, is_done, next_states = learner.step()
+		finished &= is_done
+
+		if finished.any():
+			returns[finished] += rewards[finished]
+			correct[finished] += rewards[finished] > 0
+			decision_time[finished] += np.absolute(next_states[finished, 1])
+			games[finished] += 1
+
+			if args.save_interval > 0:
+				saved = np.flatnonzero(finished & (learner.num_games % args.save_interval == 0))
+				exploration, lr = learner.get_exploration(), learner.get_lr()
+				for run in saved:
+					learner.save_q_state(run_dirs[run], run, learner.num_games[run])
+					csv_loggers[run].writerow([learner.num_games[run], learner.num_frames[run], exploration[run], lr[run],
+						returns[run] / games[run], correct[run] / games[run], decision_time[run] / games[run]])
+					csv_files[run].flush()
+				returns[saved] = correct[saved] = decision_time[saved] = games[saved] = 0
+
+			learner.active &= learner.num_games < args.games
+
+	for f in csv_files:
+		f.close()
+
+	duration = time.time() - start_time
+	print("done in {:.1f}s, {:,.0f} steps/s".format(duration, learner.num_frames.sum() / duration))
+
+if __name__ == '__main__':
+	main()
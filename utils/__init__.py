@@ -1,2 +1,4 @@
 from .other import *
-from .storage import *
\ No newline at end of file
+from .storage import *
+from .stats import *
+from .episodes import *
\ No newline at end of file
@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import re
+import time
+
+import numpy
+
+
+class ColumnStore:
+    """
+    Append-only columnar store in a directory, one raw binary file per column and a meta.json.
+    Rows are buffered in fixed-size chunks and appended to the column files, so saving costs
+    the size of the new rows only. meta.json records the number of rows written and is replaced
+    atomically after the columns, bytes past that count (e.g. from a crash) are dropped on reopen.
+    columns maps a name to (dtype, shape of one row), e.g. {'reward': ('float32', ())}.
+    Rows are flushed once chunk_size are buffered or, if flush_seconds is set, once that much time
+    has passed since the last flush, so a log being written can be read while the run goes on.
+    num_rows keeps only that many rows of an existing store, e.g. the offset saved in a checkpoint.
+    """
+
+    def __init__(self, path, columns, chunk_size=4096, flush_seconds=None, num_rows=None):
+        self.path = path
+        self.columns = {name: (numpy.dtype(dtype), tuple(shape)) for name, (dtype, shape) in columns.items()}
+        self.chunk_size = chunk_size
+        self.flush_seconds = flush_seconds
+        os.makedirs(path, exist_ok=True)
+
+        meta = read_meta(path)
+        self.num_rows = meta["num_rows"] if meta else 0
+        if num_rows is not None:
+            self.num_rows = min(num_rows, self.num_rows)
+        for name, (dtype, shape) in self.columns.items():
+            # the store is reopened for appending, e.g. when a run is resumed
+            column_path = self._column_path(name)
+            with open(column_path, "ab") as f:
+                f.truncate(self.num_rows * dtype.itemsize * int(numpy.prod(shape)))
+
+        self._buffers = {name: numpy.zeros((chunk_size,) + shape, dtype=dtype) for name, (dtype, shape) in self.columns.items()}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._write_meta()
+
+    def __len__(self):
+        return self.num_rows + self._pending
+
+    def _column_path(self, name):
+        return os.path.join(self.path, name + ".bin")
+
+    def append(self, **row):
+        """
+        Adds one row, with a value for every column
+        """
+        for name, value in row.items():
+            self._buffers[name][self._pending] = value
+        self._pending += 1
+        if self._pending == self.chunk_size:
+            self.flush()
+        elif self.flush_seconds is not None and time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """
+        Appends the buffered rows to the column files
+        """
+        if not self._pending:
+            return
+        for name, buffer in self._buffers.items():
+            with open(self._column_path(name), "ab") as f:
+                f.write(buffer[:self._pending].tobytes())
+        self.num_rows += self._pending
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            "num_rows": self.num_rows,
+            "columns": {name: [dtype.str, list(shape)] for name, (dtype, shape) in self.columns.items()},
+        }
+        tmp_path = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.path, "meta.json"))
+
+    def close(self):
+        self.flush()
+
+
+def read_meta(path):
+    meta_path = os.path.join(path, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def open_columns(path, num_rows=None):
+    """
+    Read-only memory-mapped view of every column of a ColumnStore, limited to the first num_rows rows.
+    : return (dict) : column name -> array of shape (rows,) + row shape
+    """
+    meta = read_meta(path)
+    if meta is None:
+        raise FileNotFoundError("no column store in " + path)
+    rows = meta["num_rows"] if num_rows is None else min(num_rows, meta["num_rows"])
+    columns = {}
+    for name, (dtype, shape) in meta["columns"].items():
+        shape = (rows,) + tuple(shape)
+        if rows:
+            columns[name] = numpy.memmap(os.path.join(path, name + ".bin"), dtype=numpy.dtype(dtype), mode="r", shape=shape)
+        else:
+            # numpy cannot map an empty file
+            columns[name] = numpy.zeros(shape, dtype=numpy.dtype(dtype))
+    return columns
+
+
+def get_episodes_dir(model_dir, name="episodes"):
+    return os.path.join(model_dir, name)
+
+
+class EpisodeStore(ColumnStore):
+    """
+    Games of a run in <model_dir>/<name>, with the columns of the df_<games>.pkl dataframes and
+    log.csv rows the scripts used to write: token trajectories padded to height+1 steps (int8, with
+    their length), choices (int8), decision times (int16), rewards (float32), and the average reward
+    estimate at the end of the game.
+    main.py keeps every game in 'episodes' and the games of its log lines in 'log', see get_episode_log.
+    """
+
+    def __init__(self, model_dir, height, chunk_size=4096, flush_seconds=None, name="episodes", num_rows=None):
+        if height > 127:
+            raise ValueError("int8 trajectories need a height of at most 127")
+        super().__init__(get_episodes_dir(model_dir, name), {
+            "trajectory": ("int8", (height + 1,)),
+            "length": ("int16", ()),
+            "choice_made": ("int8", ()),
+            "correct_choice": ("int8", ()),
+            "decision_time": ("int16", ()),
+            "reward_received": ("float32", ()),
+            "avg_reward": ("float32", ()),
+        }, chunk_size, flush_seconds, num_rows)
+        self._trajectory = numpy.zeros(height + 1, dtype=numpy.int8)
+
+    def add_game(self, trajectory, choice_made, correct_choice, decision_time, reward_received, avg_reward=0.0):
+        self._trajectory[:] = 0
+        self._trajectory[:len(trajectory)] = trajectory
+        self.append(trajectory=self._trajectory, length=len(trajectory), choice_made=choice_made, correct_choice=correct_choice,
+            decision_time=decision_time, reward_received=reward_received, avg_reward=avg_reward)
+
+
+def load_episodes(model_dir, num_games=None):
+    """
+    Memory-mapped columns of the EpisodeStore of a run, see open_columns
+    """
+    return open_columns(get_episodes_dir(model_dir), num_games)
+
+
+def load_episode_dataframe(model_dir, num_games=None):
+    """
+    The games of a run as the dataframe main.py used to pickle to df_<num_games>.pkl
+    (trajectory, choice_made, correct_choice, decision_time, reward_received), from its
+    EpisodeStore or, for older runs, from the pickle itself.
+    """
+    import pandas as pd # only loaded by the scripts that analyse runs
+
+    if read_meta(get_episodes_dir(model_dir)) is None:
+        if num_games is None:
+            saved = [int(name[3:-4]) for name in os.listdir(model_dir) if name.startswith("df_") and name.endswith(".pkl")]
+            num_games = max(saved)
+        return pd.read_pickle(os.path.join(model_dir, "df_{}.pkl".format(num_games)))
+
+    episodes = load_episodes(model_dir, num_games)
+    return pd.DataFrame({
+        "trajectory": [row[:n].tolist() for row, n in zip(episodes["trajectory"], episodes["length"])],
+        "choice_made": episodes["choice_made"].astype(int),
+        "correct_choice": episodes["correct_choice"].astype(int),
+        "decision_time": episodes["decision_time"].astype(int),
+        "reward_received": episodes["reward_received"].astype(float),
+    })
+
+
+CSV_HEADER = ["trajectory", "choice_made", "correct_choice", "decision_time", "reward_received"]
+
+
+def get_episode_log(model_dir, height, flush_seconds=10, num_rows=None):
+    """
+    Binary per-game log of a training script in <model_dir>/log, replacing the log.csv rows.
+    Rows are written a chunk at a time or every flush_seconds, not one flush per game.
+    """
+    return EpisodeStore(model_dir, height, chunk_size=1024, flush_seconds=flush_seconds, name="log", num_rows=num_rows)
+
+
+def load_episode_log(model_dir):
+    """
+    Per-game log of a run as numpy arrays: trajectory (games, height+1) padded with zeros after
+    length steps, length, choice_made, correct_choice, decision_time and reward_received.
+    Runs from before the binary log are read from their log.csv.
+    """
+    if read_meta(get_episodes_dir(model_dir, "log")) is not None:
+        return {name: numpy.asarray(column) for name, column in open_columns(get_episodes_dir(model_dir, "log")).items()}
+
+    with open(os.path.join(model_dir, "log.csv")) as f:
+        rows = [row for row in csv.reader(f) if row and row[0] != "trajectory"]
+    # trajectories were written as python lists, with numpy 2 their tokens read np.int64(n)
+    trajectories = [numpy.array(re.findall(r"-?\d+(?=[),\]])", row[0]), dtype=numpy.int64) for row in rows]
+    length = numpy.array([len(trajectory) for trajectory in trajectories], dtype=numpy.int16)
+    trajectory = numpy.zeros((len(rows), length.max() if len(rows) else 0), dtype=numpy.int8)
+    for i, steps in enumerate(trajectories):
+        trajectory[i, :len(steps)] = steps
+    return {
+        "trajectory": trajectory,
+        "length": length,
+        "choice_made": numpy.array([int(row[1]) for row in rows], dtype=numpy.int8),
+        "correct_choice": numpy.array([int(row[2]) for row in rows], dtype=numpy.int8),
+        "decision_time": numpy.array([int(row[3]) for row in rows], dtype=numpy.int16),
+        "reward_received": numpy.array([float(row[4]) for row in rows], dtype=numpy.float32),
+    }
+
+
+def export_csv(model_dir, path=None):
+    """
+    Writes the binary per-game log of a run as the log.csv the scripts used to write
+    """
+    log = open_columns(get_episodes_dir(model_dir, "log"))
+    with open(path or os.path.join(model_dir, "log.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADER)
+        for row, n, choice, correct, decision_time, reward in zip(log["trajectory"], log["length"], log["choice_made"],
+                log["correct_choice"], log["decision_time"], log["reward_received"]):
+            writer.writerow([row[:n].tolist(), int(choice), int(correct), int(decision_time), reward.item()])
@@ -1,9 +1,6 @@
 import random
+import sys
 import numpy
-try:
-    import torch
-except ImportError:
-    print("no torch")
 
 import collections
 
@@ -11,7 +8,13 @@ import collections
 def seed(seed):
     random.seed(seed)
     numpy.random.seed(seed)
-    try:
-        torch.manual_seed(seed)
-    except ImportError:
-        print("no torch")
\ No newline at end of file
+    # torch is only seeded when the run uses it, importing it here would slow down every tabular run
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+
+def spawn_seeds(seed, n):
+    """
+    Spawn n independent, reproducible seed sequences from one seed, e.g. one per env,
+    policy and update rule of a run, or one per game of a parallel sweep.
+    """
+    return numpy.random.SeedSequence(seed).spawn(n)
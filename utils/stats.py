@@ -0,0 +1,76 @@
+import math
+
+import numpy
+
+
+class RingBuffer:
+    """
+    The last `size` values of a stream in a fixed array, e.g. the returns of the last 1000 games.
+    """
+
+    def __init__(self, size):
+        self.values = numpy.zeros(size)
+        self.count = 0
+
+    def append(self, value):
+        self.values[self.count % len(self.values)] = value
+        self.count += 1
+
+    def __len__(self):
+        return min(self.count, len(self.values))
+
+    def mean(self):
+        # nan before the first value, like numpy.mean of an empty list
+        n = len(self)
+        return self.values[:n].mean() if n else math.nan
+
+
+class EpisodeStats:
+    """
+    Statistics of the games of a run at a constant cost per game: running totals, the means
+    of the last `window` games and the histogram of decision times, for the training logs of
+    main.py, DQN.py, reinforce2.py and actor-critic.py.
+    The histogram is indexed like the scripts' decisionTime arrays, |ht| + height - 1.
+    """
+
+    def __init__(self, height, window=1000):
+        self.height = height
+        self.num_games = 0
+        self.num_correct = 0
+        self.num_waited = 0
+        self.total_return = 0.0
+        self.total_loss = 0.0
+        self.returns = RingBuffer(window)
+        self.losses = RingBuffer(window)
+        self.correct = RingBuffer(window)
+        self.decision_hist = numpy.zeros(2*height + 1)
+
+    def add_game(self, reward, decision_time, loss=0.0, waited=False, correct=None):
+        """
+        Adds a finished game.
+        reward is the return of the game, decision_time the |ht| of its last state and waited
+        whether the game ended without a decision; the choice is correct if the reward is positive.
+        """
+        if correct is None:
+            correct = reward > 0
+        self.num_games += 1
+        self.num_correct += bool(correct)
+        self.num_waited += bool(waited)
+        self.total_return += reward
+        self.total_loss += loss
+        self.returns.append(reward)
+        self.losses.append(loss)
+        self.correct.append(correct)
+        self.decision_hist[decision_time + self.height - 1] += 1
+
+    def avg_return(self):
+        return self.returns.mean()
+
+    def avg_loss(self):
+        return self.losses.mean()
+
+    def recent_correct(self):
+        return self.correct.mean()
+
+    def correct_percentage(self):
+        return self.num_correct / self.num_games
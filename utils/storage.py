@@ -1,10 +1,7 @@
 import csv
 import os
-try:
-	import torch
-except ImportError:
-	print("no torch")
 import logging
+import pickle
 import sys
 
 import utils
@@ -31,14 +28,48 @@ def get_status_path(model_dir):
 
 
 def get_status(model_dir):
+	import torch
 	path = get_status_path(model_dir)
 	return torch.load(path)
 
 
 def save_status(status, model_dir):
+	import torch
 	path = get_status_path(model_dir)
 	utils.create_folders_if_necessary(path)
-	torch.save(status, path)
+	# written next to the status and renamed over it, so a crash never leaves half a file
+	torch.save(status, path + ".tmp")
+	os.replace(path + ".tmp", path)
+
+
+def get_checkpoint_path(model_dir):
+	return os.path.join(model_dir, "checkpoint.pkl")
+
+
+def get_checkpoint(model_dir):
+	"""
+	Last checkpoint saved by save_checkpoint, None if the run has none
+	"""
+	path = get_checkpoint_path(model_dir)
+	if not os.path.exists(path):
+		return None
+	with open(path, "rb") as f:
+		return pickle.load(f)
+
+
+def save_checkpoint(checkpoint, model_dir):
+	"""
+	Pickles a checkpoint of a tabular run (no torch needed). It is written and synced to a
+	temporary file that replaces the previous checkpoint in one rename, so a crash leaves
+	either the old or the new checkpoint whole.
+	"""
+	path = get_checkpoint_path(model_dir)
+	utils.create_folders_if_necessary(path)
+	with open(path + ".tmp", "wb") as f:
+		pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(path + ".tmp", path)
 
 
 def get_vocab(model_dir):